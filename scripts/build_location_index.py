@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Construye/refresca el índice sidecar de ubicaciones de informes CER."""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from oraculo.config import get_settings
+from oraculo.observability.logging import setup_logging
+from oraculo.rag.doc_context import extract_doc_location
+from oraculo.rag.doc_sidecar import build_sidecar
+from oraculo.rag.location_index import INDEX_VERSION, LOCATION_FIELDS, location_index_path
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--full", action="store_true", help="Reconstruye todos los informes (ignora el índice previo).")
+    parser.add_argument("--path", default="", help="Ruta de salida (por defecto junto a CER.csv).")
+    args = parser.parse_args()
+
+    setup_logging()
+    settings = get_settings()
+    try:
+        docs, stats = build_sidecar(
+            settings,
+            Path(args.path) if args.path else location_index_path(settings),
+            INDEX_VERSION,
+            extract_doc_location,
+            label="ubicaciones",
+            full=args.full,
+        )
+    except Exception as e:
+        logger.error("Error construyendo índice de ubicaciones: %s", e, exc_info=True)
+        sys.exit(1)
+    stats["with_location"] = sum(1 for entry in docs.values() if any(entry.get(f) for f in LOCATION_FIELDS))
+    logger.info("Índice de ubicaciones listo: %s", stats)
+
+
+if __name__ == "__main__":
+    main()
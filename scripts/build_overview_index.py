@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""Construye/refresca el índice local de overviews de informes CER."""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from oraculo.config import get_settings
+from oraculo.observability.logging import setup_logging
+from oraculo.rag.overview_index import build_overview_index
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--full", action="store_true", help="Reconstruye todos los informes (ignora el índice previo).")
+    parser.add_argument("--path", default="", help="Ruta de salida (por defecto CER_OVERVIEW_INDEX_PATH).")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        stats = build_overview_index(get_settings(), path=args.path, full=args.full)
+    except Exception as e:
+        logger.error("Error construyendo índice de overviews: %s", e, exc_info=True)
+        sys.exit(1)
+    logger.info("Índice de overviews listo: %s", stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Crea/verifica los índices de payload de las colecciones CER y SAG."""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from oraculo.config import get_settings
+from oraculo.observability.logging import setup_logging
+from oraculo.vectorstore.payload_indexes import ensure_payload_indexes, verify_payload_indexes
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--check", action="store_true", help="Solo revisa y avisa; no crea índices.")
+    parser.add_argument("--no-measure", action="store_true", help="No mide los filtros antes/después.")
+    args = parser.parse_args()
+
+    setup_logging()
+    settings = get_settings()
+    try:
+        if args.check:
+            missing = verify_payload_indexes(settings)
+            logger.info("Índices faltantes: %s", missing)
+            sys.exit(1 if any(missing.values()) else 0)
+        report = ensure_payload_indexes(settings, measure=not args.no_measure)
+    except Exception as e:
+        logger.error("Error revisando índices de payload: %s", e, exc_info=True)
+        sys.exit(1)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
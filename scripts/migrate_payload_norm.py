@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Escribe campos canónicos `*_norm` (e índices keyword) en las colecciones CER y SAG."""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from oraculo.config import get_settings
+from oraculo.observability.logging import setup_logging
+from oraculo.vectorstore.payload_norm import CER_NORM_FIELDS, SAG_NORM_FIELDS, migrate_payload_norm
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--collection",
+        choices=("cer", "sag", "all"),
+        default="all",
+        help="Colección a migrar (por defecto ambas).",
+    )
+    parser.add_argument("--full", action="store_true", help="Reescribe todos los puntos (ignora los ya migrados).")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta los puntos a actualizar.")
+    args = parser.parse_args()
+
+    setup_logging()
+    settings = get_settings()
+    targets = []
+    if args.collection in ("cer", "all"):
+        targets.append((settings.qdrant_collection, CER_NORM_FIELDS))
+    if args.collection in ("sag", "all"):
+        targets.append((settings.qdrant_sag_collection, SAG_NORM_FIELDS))
+
+    for collection, fields in targets:
+        try:
+            stats = migrate_payload_norm(settings, collection, fields, full=args.full, dry_run=args.dry_run)
+        except Exception as e:
+            logger.error("Error migrando payload de %s: %s", collection, e, exc_info=True)
+            sys.exit(1)
+        logger.info("Migración *_norm lista | colección=%s | %s", collection, stats)
+
+
+if __name__ == "__main__":
+    main()
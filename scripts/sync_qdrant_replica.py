@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Sincroniza la réplica local de Qdrant (QDRANT_REPLICA_PATH) desde la nube."""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from oraculo.config import get_settings
+from oraculo.observability.logging import setup_logging
+from oraculo.vectorstore.replica import check_replica_drift, close_replica, sync_replica
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--check", action="store_true", help="Solo re-sincroniza si hay drift o la réplica está vencida.")
+    args = parser.parse_args()
+
+    setup_logging()
+    settings = get_settings()
+    if not (settings.qdrant_replica_path or "").strip():
+        logger.error("QDRANT_REPLICA_PATH no está definido.")
+        sys.exit(1)
+    try:
+        result = check_replica_drift(settings) if args.check else sync_replica(settings)
+    except Exception as e:
+        logger.error("Error sincronizando la réplica Qdrant: %s", e, exc_info=True)
+        sys.exit(1)
+    finally:
+        close_replica()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
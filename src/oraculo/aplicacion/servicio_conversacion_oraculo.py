@@ -26,6 +26,7 @@ from ..conversation.flujo_guiado import (
 )
 from ..providers.llm import generate_answer
 from ..router import GlobalRouterDecision, route_global_action
+from ..turn_context import turn_context
 from .modelos_oraculo import RespuestaOraculo
 from .texto_oraculo import (
     ACLARACION_ACCION,
@@ -57,14 +58,16 @@ class ServicioConversacionOraculo:
         top_k: int = 8,
         progress_callback: Callable[[str], None] | None = None,
     ) -> RespuestaOraculo:
-        with self._get_user_lock(user_id):
-            return self._procesar_mensaje_serializado(
+        with self._get_user_lock(user_id), turn_context() as turno:
+            respuesta = self._procesar_mensaje_serializado(
                 user_id=user_id,
                 mensaje_usuario=mensaje_usuario,
                 settings=settings,
                 top_k=top_k,
                 progress_callback=progress_callback,
             )
+            logger.info("🧮 Memo del turno | %s", turno.stats())
+            return respuesta
 
     def _procesar_mensaje_serializado(
         self,
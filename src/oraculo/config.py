@@ -28,6 +28,42 @@ class Settings(BaseSettings):
             "QDRANT_SAG_COLLECTION_VECTOR_DIM",
         ),
     )
+    qdrant_vector_projection_dir: str = Field(
+        default="",
+        validation_alias="QDRANT_VECTOR_PROJECTION_DIR",
+    )
+    qdrant_timeout_seconds: int = Field(
+        default=30,
+        validation_alias="QDRANT_TIMEOUT_SECONDS",
+    )
+    qdrant_query_timeout_seconds: int = Field(
+        default=20,
+        validation_alias="QDRANT_QUERY_TIMEOUT_SECONDS",
+    )
+    qdrant_max_connections: int = Field(
+        default=32,
+        validation_alias="QDRANT_MAX_CONNECTIONS",
+    )
+    qdrant_max_keepalive_connections: int = Field(
+        default=16,
+        validation_alias="QDRANT_MAX_KEEPALIVE_CONNECTIONS",
+    )
+    qdrant_keepalive_expiry_seconds: float = Field(
+        default=60.0,
+        validation_alias="QDRANT_KEEPALIVE_EXPIRY_SECONDS",
+    )
+    qdrant_replica_path: str = Field(
+        default="",
+        validation_alias="QDRANT_REPLICA_PATH",
+    )
+    qdrant_replica_max_age_seconds: float = Field(
+        default=86400.0,
+        validation_alias="QDRANT_REPLICA_MAX_AGE_SECONDS",
+    )
+    qdrant_replica_check_interval_seconds: float = Field(
+        default=300.0,
+        validation_alias="QDRANT_REPLICA_CHECK_INTERVAL_SECONDS",
+    )
 
     # ===== GEMINI API =====
     gemini_api_key: SecretStr = Field(validation_alias="GEMINI_API_KEY")
@@ -104,6 +140,20 @@ class Settings(BaseSettings):
         validation_alias="RAG_USE_QUERY_REFINER",
     )
 
+    # ===== CACHE EMBEDDINGS =====
+    embedding_cache_max_entries: int = Field(
+        default=4096,
+        validation_alias="EMBEDDING_CACHE_MAX_ENTRIES",
+    )
+    embedding_cache_ttl_seconds: int = Field(
+        default=604800,
+        validation_alias="EMBEDDING_CACHE_TTL_SECONDS",
+    )
+    embedding_cache_path: str = Field(
+        default="",
+        validation_alias="EMBEDDING_CACHE_PATH",
+    )
+
     # ===== RAG CONTEXTO =====
     rag_top_docs: int = Field(default=8, validation_alias="RAG_TOP_DOCS")
     rag_total_context_char_budget: int = Field(
@@ -119,14 +169,66 @@ class Settings(BaseSettings):
         validation_alias="RAG_MAX_DOC_CHAR_BUDGET",
     )
     rag_sag_top_k: int = Field(default=8, validation_alias="RAG_SAG_TOP_K")
+    rag_cer_retrieval_mode: str = Field(
+        default="grouped",
+        validation_alias="RAG_CER_RETRIEVAL_MODE",
+    )
+    rag_doc_fetch_strategy: str = Field(
+        default="per_doc",
+        validation_alias="RAG_DOC_FETCH_STRATEGY",
+    )
+    rag_doc_planned_fetch: bool = Field(
+        default=True,
+        validation_alias="RAG_DOC_PLANNED_FETCH",
+    )
+    rag_doc_cache_max_bytes: int = Field(
+        default=67108864,
+        validation_alias="RAG_DOC_CACHE_MAX_BYTES",
+    )
+    rag_doc_cache_ttl_seconds: int = Field(
+        default=3600,
+        validation_alias="RAG_DOC_CACHE_TTL_SECONDS",
+    )
+    rag_doc_cache_fingerprint_interval_seconds: float = Field(
+        default=60.0,
+        validation_alias="RAG_DOC_CACHE_FINGERPRINT_INTERVAL_SECONDS",
+    )
+    rag_doc_fetch_concurrency: int = Field(
+        default=8,
+        validation_alias="RAG_DOC_FETCH_CONCURRENCY",
+    )
+    rag_doc_fetch_timeout_seconds: float = Field(
+        default=25.0,
+        validation_alias="RAG_DOC_FETCH_TIMEOUT_SECONDS",
+    )
     cer_csv_path: str = Field(
         default="CER.csv",
         validation_alias="CER_CSV_PATH",
     )
+    cer_location_index_path: str = Field(
+        default="",
+        validation_alias="CER_LOCATION_INDEX_PATH",
+    )
+    cer_overview_index_path: str = Field(
+        default="data/cer_overview_index.json",
+        validation_alias="CER_OVERVIEW_INDEX_PATH",
+    )
     sag_csv_path: str = Field(
         default="SAG.csv",
         validation_alias=AliasChoices("SAG_CSV_PATH", "SAG_EXCEL_PATH"),
     )
+    sag_table_enabled: bool = Field(
+        default=True,
+        validation_alias="SAG_TABLE_ENABLED",
+    )
+    sag_table_max_rows: int = Field(
+        default=50000,
+        validation_alias="SAG_TABLE_MAX_ROWS",
+    )
+    sag_table_sync_interval_seconds: float = Field(
+        default=300.0,
+        validation_alias="SAG_TABLE_SYNC_INTERVAL_SECONDS",
+    )
 
     # ===== TELEGRAM BOT =====
     telegram_bot_token: SecretStr = Field(validation_alias="TELEGRAM_BOT_TOKEN")
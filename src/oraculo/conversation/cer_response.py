@@ -15,8 +15,14 @@ from ..followup import (
 )
 from ..providers.llm import generate_answer
 from ..rag.doc_context import DocContext, build_doc_contexts_from_hits
+from ..rag.overview_index import doc_context_from_entry, load_overview_index
 from ..rag.retriever import retrieve
-from ..sources.cer_csv_lookup import detect_cer_entities, find_cer_records_by_query, load_cer_index
+from ..sources.cer_csv_lookup import (
+    detect_cer_entities,
+    doc_lookup_keys,
+    find_cer_records_by_query,
+    load_cer_index,
+)
 from ..sources.resolver import format_sources_from_hits
 from .flow_helpers import (
     deserialize_doc_contexts,
@@ -464,11 +470,8 @@ def _build_report_options_from_hits(
     overview_by_doc_id: dict[str, DocContext] | None = None,
 ) -> list[dict[str, Any]]:
     index = load_cer_index(settings.cer_csv_path)
-    by_pdf = {normalize_text(rec.pdf): rec for rec in index.records if normalize_text(rec.pdf)}
-    by_doc_key: dict[str, Any] = {}
-    for rec in index.records:
-        for key in _doc_lookup_keys_from_value(rec.pdf):
-            by_doc_key[key] = rec
+    by_pdf = index.by_pdf
+    by_doc_key = index.by_doc_key
 
     options: list[dict[str, Any]] = []
     seen_doc_ids: set[str] = set()
@@ -483,12 +486,12 @@ def _build_report_options_from_hits(
         pdf = str(payload.get("pdf_filename") or payload.get("pdf") or "").strip()
         rec = by_pdf.get(normalize_text(pdf)) if pdf else None
         if rec is None:
-            for key in _doc_lookup_keys_from_value(doc_id):
+            for key in doc_lookup_keys(doc_id):
                 rec = by_doc_key.get(key)
                 if rec is not None:
                     break
         if rec is None and pdf:
-            for key in _doc_lookup_keys_from_value(pdf):
+            for key in doc_lookup_keys(pdf):
                 rec = by_doc_key.get(key)
                 if rec is not None:
                     break
@@ -557,9 +560,34 @@ def _build_overview_doc_context_by_doc_id(
 ) -> dict[str, DocContext]:
     if not hits:
         return {}
-    top_docs = max(1, len({str((h.get("payload") or {}).get("doc_id") or "").strip() for h in hits if str((h.get("payload") or {}).get("doc_id") or "").strip()}))
-    doc_contexts = build_doc_contexts_from_hits(hits, settings, top_docs=top_docs)
+    hit_doc_ids = {
+        str((h.get("payload") or {}).get("doc_id") or "").strip()
+        for h in hits
+        if str((h.get("payload") or {}).get("doc_id") or "").strip()
+    }
     out: dict[str, DocContext] = {}
+
+    # Overviews precalculados (sin tráfico a Qdrant); solo se expanden los faltantes.
+    overview_index = load_overview_index(settings.cer_overview_index_path, settings.qdrant_collection)
+    if overview_index is not None:
+        for doc_id in hit_doc_ids:
+            entry = overview_index.get(doc_id)
+            if entry is not None:
+                out[doc_id] = doc_context_from_entry(doc_id, entry)
+    missing_doc_ids = hit_doc_ids - set(out)
+    logger.info(
+        "🗂️ Overviews listado | desde_indice=%s | a_expandir=%s",
+        len(out),
+        len(missing_doc_ids),
+    )
+    if not missing_doc_ids:
+        return out
+
+    missing_hits = [
+        h for h in hits
+        if str((h.get("payload") or {}).get("doc_id") or "").strip() in missing_doc_ids
+    ]
+    doc_contexts = build_doc_contexts_from_hits(missing_hits, settings, top_docs=len(missing_doc_ids))
     for dc in doc_contexts:
         doc_id = str(dc.doc_id or "").strip()
         if doc_id:
@@ -586,6 +614,47 @@ def _collect_overview_contexts_from_reports(
     return out
 
 
+def overview_only_doc_ids(doc_contexts: list[DocContext], settings: Settings) -> list[str]:
+    """
+    doc_ids cuyo contexto de listado salió del índice de overviews (solo
+    chunks de overview); se expanden al informe completo recién cuando un
+    follow-up los necesita (`expand_overview_doc_contexts`).
+    """
+    overview_index = load_overview_index(settings.cer_overview_index_path, settings.qdrant_collection)
+    if overview_index is None:
+        return []
+    return [dc.doc_id for dc in doc_contexts if overview_index.get(dc.doc_id) is not None]
+
+
+def expand_overview_doc_contexts(
+    doc_contexts: list[DocContext],
+    pending_doc_ids: list[str],
+    seed_hits: list[dict[str, Any]],
+    settings: Settings,
+) -> list[DocContext]:
+    """
+    Reemplaza, en el mismo orden, los contextos solo-overview por el
+    contexto completo del informe armado desde los hits de la búsqueda.
+    """
+    pending = {str(doc_id or "").strip() for doc_id in pending_doc_ids} - {""}
+    pending_hits = [
+        h for h in seed_hits
+        if str((h.get("payload") or {}).get("doc_id") or "").strip() in pending
+    ]
+    if not pending_hits:
+        return doc_contexts
+    full_by_doc_id = {
+        str(dc.doc_id or "").strip(): dc
+        for dc in build_doc_contexts_from_hits(pending_hits, settings, top_docs=len(pending))
+    }
+    logger.info(
+        "🗂️ Contextos de listado expandidos | pendientes=%s | expandidos=%s",
+        len(pending),
+        len(full_by_doc_id),
+    )
+    return [full_by_doc_id.get(str(dc.doc_id or "").strip(), dc) for dc in doc_contexts]
+
+
 def _extract_overview_text(doc_context: DocContext | None) -> str:
     if doc_context is None:
         return ""
@@ -697,10 +766,12 @@ def _build_report_options_from_csv_species(
     options: list[dict[str, Any]] = []
     seen_keys: set[tuple[str, str, str, str, str]] = set()
 
-    for rec in index.records:
+    record_ids = sorted(
+        rid for especie_norm in species_hints_norm for rid in index.records_by_especie.get(especie_norm, ())
+    )
+    for rid in record_ids:
+        rec = index.records[rid]
         especie_norm = normalize_text(rec.especie)
-        if not especie_norm or especie_norm not in species_hints_norm:
-            continue
 
         key = (
             normalize_text(rec.producto),
@@ -746,16 +817,6 @@ def _display_value(value: Any) -> str:
     return text
 
 
-def _doc_lookup_keys_from_value(value: Any) -> set[str]:
-    raw = str(value or "").strip()
-    if not raw:
-        return set()
-    name = Path(raw).name
-    stem = Path(name).stem
-    keys = {normalize_text(raw), normalize_text(name), normalize_text(stem)}
-    return {k for k in keys if k}
-
-
 def _doc_id_candidates_from_pdf(pdf_value: Any) -> list[str]:
     raw = str(pdf_value or "").strip()
     if not raw:
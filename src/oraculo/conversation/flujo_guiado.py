@@ -18,17 +18,21 @@ from ..aplicacion.texto_oraculo import INTRO_ORACULO_CER
 from ..config import Settings
 from ..followup import render_report_options
 from ..providers.llm import generate_answer
+from ..rag.doc_context import DocContext
 from ..rag.retriever import retrieve
 from ..sources.cer_csv_lookup import build_cer_csv_hints_block
 from .cer_response import (
     build_cer_first_response_from_hits,
+    expand_overview_doc_contexts,
     generate_cer_detail_followup_response,
     generate_conversational_followup_response,
+    overview_only_doc_ids,
 )
 from .flow_helpers import (
     build_followup_clarify_text,
     deserialize_doc_contexts,
     is_affirmative,
+    deserialize_seed_hits,
     is_negative,
     last_assistant_message,
     looks_like_problem_query,
@@ -180,6 +184,7 @@ def _handle_problem_query(
     )
     sesion.flow_data["last_question"] = question
     sesion.flow_data["last_doc_contexts"] = []
+    sesion.flow_data["last_doc_contexts_overview_only"] = []
     sesion.flow_data["last_detail_doc_contexts"] = []
     sesion.flow_data["last_cer_seed_hits"] = serialize_seed_hits(hits)
     sesion.flow_data["last_sag_router_context"] = ""
@@ -197,6 +202,7 @@ def _handle_problem_query(
     logger.info("📝 Flujo CER | listado preparado.")
     sesion.flow_data["offered_reports"] = report_options
     sesion.flow_data["last_doc_contexts"] = serialize_doc_contexts(overview_contexts)
+    sesion.flow_data["last_doc_contexts_overview_only"] = overview_only_doc_ids(overview_contexts, settings)
     sesion.flow_data["last_cer_router_context"] = _build_cer_router_context(report_options)
     sesion.flow_data["last_cer_overview_router_context"] = _build_last_search_overview_context(
         report_options=report_options,
@@ -253,9 +259,7 @@ def _handle_product_detail_followup(
         )
 
     if forced == "CHAT_REPLY":
-        base_contexts = last_detail_contexts or deserialize_doc_contexts(
-            sesion.flow_data.get("last_doc_contexts") or []
-        )
+        base_contexts = last_detail_contexts or _listing_doc_contexts(sesion, settings)
         chat_response = generate_conversational_followup_response(
             last_question=str(sesion.flow_data.get("last_question") or "").strip(),
             last_assistant_message=last_assistant_message(sesion),
@@ -286,6 +290,23 @@ def _handle_product_detail_followup(
     return GuidedFlowResult(handled=True, response=detail_response, rag_tag="cer")
 
 
+def _listing_doc_contexts(sesion: SesionChat, settings: Settings) -> list[DocContext]:
+    """Contextos del último listado, con los informes solo-overview expandidos (una vez)."""
+    doc_contexts = deserialize_doc_contexts(sesion.flow_data.get("last_doc_contexts") or [])
+    pending = [str(d) for d in sesion.flow_data.get("last_doc_contexts_overview_only") or []]
+    if not pending or not doc_contexts:
+        return doc_contexts
+    doc_contexts = expand_overview_doc_contexts(
+        doc_contexts,
+        pending,
+        deserialize_seed_hits(sesion.flow_data.get("last_cer_seed_hits") or []),
+        settings,
+    )
+    sesion.flow_data["last_doc_contexts"] = serialize_doc_contexts(doc_contexts)
+    sesion.flow_data["last_doc_contexts_overview_only"] = []
+    return doc_contexts
+
+
 def _handle_sag_followup(
     sesion: SesionChat,
     user_message: str,
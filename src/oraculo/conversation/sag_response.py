@@ -5,15 +5,14 @@ from __future__ import annotations
 import logging
 import re
 from dataclasses import dataclass, field
+from functools import partial
 from typing import Any, Callable
 
 from ..config import Settings
 from ..providers.llm import generate_answer
-from ..rag.retriever import (
-    retrieve_sag,
-    retrieve_sag_rows_by_ids,
-    retrieve_sag_rows_for_products,
-)
+from ..rag.retriever import retrieve_sag, retrieve_sag_rows_matching
+from ..rag.sag_table import SagRegistryTable, current_sag_table, register_sag_column
+from ..sources.catalog_manager import catalog_version
 from ..sources.sag_csv_lookup import (
     build_csv_query_hints_block,
     find_products_by_query,
@@ -30,6 +29,8 @@ from .flow_helpers import (
 
 logger = logging.getLogger(__name__)
 RESPUESTA_SAG_PROMPT_FILE = "respuesta_sag.md"
+# Tope de términos por campo en filtros por id (igual que el retriever).
+SAG_ID_TERMS_MAX = 500
 
 
 @dataclass(slots=True)
@@ -107,39 +108,45 @@ def generate_sag_response(
             filtered_seed_hits = ingredient_seed
     filtered_seed_hits = _filtrar_hits_por_producto(filtered_seed_hits, product_hint)
 
-    # Enriquecimiento con filas completas
-    seed_for_enrich = filtered_seed_hits or seed_hits
-    sag_hits = retrieve_sag_rows_for_products(
-        seed_for_enrich,
-        settings,
-        max_rows_per_filter=max(base_top_k * 16, 160),
-    )
-    # Conserva también los hallazgos CSV iniciales en la etapa de consolidación.
-    if csv_pre_product_ids or csv_pre_auths:
-        pre_csv_rows = retrieve_sag_rows_by_ids(
-            settings=settings,
-            product_ids=csv_pre_product_ids,
-            auth_numbers=csv_pre_auths,
-            max_rows=max(base_top_k * 220, 4500),
-        )
-        if pre_csv_rows:
-            sag_hits = merge_hits_by_id(sag_hits, pre_csv_rows)
+    # Las lecturas por id conocidas de antemano (enriquecimiento, CSV inicial y
+    # boosts) se resuelven juntas en un solo scroll.
+    seed_for_enrich = filtered_seed_hits or seed_hits
+    enrich_max_rows = max(base_top_k * 16, 160)
+    pre_csv_max_rows = max(base_top_k * 220, 4500)
+    fetch_planner = SagFetchPlanner(settings)
+    fetch_planner.plan_for_products(seed_for_enrich, max_rows_per_filter=enrich_max_rows)
+    fetch_planner.plan(product_ids=csv_pre_product_ids, auth_numbers=csv_pre_auths, max_rows=pre_csv_max_rows)
+    _plan_csv_boosts(fetch_planner, objective_hint, ingredient_hint, settings, base_top_k)
+
+    # Enriquecimiento con filas completas
+    sag_hits = fetch_planner.rows_for_products(seed_for_enrich, max_rows_per_filter=enrich_max_rows)
+    # Conserva también los hallazgos CSV iniciales en la etapa de consolidación.
+    if csv_pre_product_ids or csv_pre_auths:
+        pre_csv_rows = fetch_planner.rows_by_ids(
+            product_ids=csv_pre_product_ids,
+            auth_numbers=csv_pre_auths,
+            max_rows=pre_csv_max_rows,
+        )
+        if pre_csv_rows:
+            sag_hits = merge_hits_by_id(sag_hits, pre_csv_rows)
 
     # Boost de recall con CSV por objetivo
-    sag_hits = _boost_with_csv_objective(sag_hits, objective_hint, settings, base_top_k)
+    sag_hits = _boost_with_csv_objective(sag_hits, objective_hint, settings, base_top_k, fetch_planner)
     # Boost de recall con CSV por ingrediente
-    sag_hits = _boost_with_csv_ingredient(sag_hits, ingredient_hint, settings, base_top_k)
-
-    # Filtrado post-enriquecimiento
-    sag_hits = _post_enrich_filter(sag_hits, ingredient_hint, objective_hint)
-    # 4) Confirmación final CSV + RAG para formar la lista.
-    sag_hits = _confirm_hits_with_csv(
-        sag_hits=sag_hits,
-        normalized_query=normalized_query,
-        effective_user_message=effective_user_message,
-        settings=settings,
-        base_top_k=base_top_k,
-    )
+    sag_hits = _boost_with_csv_ingredient(sag_hits, ingredient_hint, settings, base_top_k, fetch_planner)
+
+    # Filtrado post-enriquecimiento
+    sag_hits = _post_enrich_filter(sag_hits, ingredient_hint, objective_hint)
+    # 4) Confirmación final CSV + RAG para formar la lista.
+    sag_hits = _confirm_hits_with_csv(
+        sag_hits=sag_hits,
+        normalized_query=normalized_query,
+        effective_user_message=effective_user_message,
+        settings=settings,
+        base_top_k=base_top_k,
+        fetch_planner=fetch_planner,
+    )
+    fetch_planner.log_stats()
 
     if not sag_hits:
         return SagFlowResult(
@@ -160,26 +167,183 @@ def generate_sag_response(
     )
 
 
+# ---------------------------------------------------------------------------
+# Plan de lecturas SAG por id
+# ---------------------------------------------------------------------------
+
+def _id_terms(values: Any) -> list[str]:
+    return sorted({str(x).strip() for x in (values or ()) if str(x).strip()})[:SAG_ID_TERMS_MAX]
+
+
+def _seed_ids(seed_hits: list[dict[str, Any]]) -> tuple[set[str], set[str]]:
+    product_ids: set[str] = set()
+    auth_numbers: set[str] = set()
+    for hit in seed_hits:
+        payload = hit.get("payload") or {}
+        product_ids.add(str(payload.get("producto_id") or "").strip())
+        auth_numbers.add(str(payload.get("autorizacion_sag_numero_normalizado") or "").strip())
+    return product_ids, auth_numbers
+
+
+@dataclass(slots=True)
+class _IdFetch:
+    product_ids: list[str]
+    auth_numbers: list[str]
+    max_rows: int
+
+    @property
+    def scrolls(self) -> int:
+        """Scrolls que haría el retriever por separado (uno por campo con ids)."""
+        return int(bool(self.product_ids)) + int(bool(self.auth_numbers))
+
+
+class SagFetchPlanner:
+    """
+    Reúne las lecturas SAG por producto_id/autorización de un turno y las
+    resuelve con un solo scroll sobre la unión de ids. Cada consumidor recibe
+    el mismo recorte que le daría su propio scroll (orden y `max_rows` por
+    campo); si el pool leído no alcanza para garantizarlo, ese campo se lee
+    aparte.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._planned: list[_IdFetch] = []
+        self._pool: SagRegistryTable | None = None
+        self._pool_values: dict[str, set[str]] = {}
+        self._pool_complete = False
+        self.requests = 0
+        self.round_trips = 0
+        self.naive_round_trips = 0
+        self.rows_served = 0
+        self.rows_fetched = 0
+
+    def plan(self, *, product_ids: Any, auth_numbers: Any, max_rows: int) -> None:
+        fetch = _IdFetch(_id_terms(product_ids), _id_terms(auth_numbers), max_rows)
+        if fetch.scrolls:
+            self._planned.append(fetch)
+
+    def plan_for_products(self, seed_hits: list[dict[str, Any]], *, max_rows_per_filter: int) -> None:
+        product_ids, auth_numbers = _seed_ids(seed_hits)
+        self.plan(product_ids=product_ids, auth_numbers=auth_numbers, max_rows=max_rows_per_filter)
+
+    def rows_by_ids(self, *, product_ids: Any, auth_numbers: Any, max_rows: int) -> list[dict[str, Any]]:
+        """Mismo resultado que `retrieve_sag_rows_by_ids`."""
+        fetch = _IdFetch(_id_terms(product_ids), _id_terms(auth_numbers), max_rows)
+        if not fetch.scrolls:
+            return []
+        return self._serve(fetch)
+
+    def rows_for_products(
+        self,
+        seed_hits: list[dict[str, Any]],
+        *,
+        max_rows_per_filter: int,
+    ) -> list[dict[str, Any]]:
+        """Seeds + filas de sus `producto_id`/autorización, cada consulta cortada en `max_rows_per_filter`."""
+        product_ids, auth_numbers = _seed_ids(seed_hits)
+        fetch = _IdFetch(_id_terms(product_ids), _id_terms(auth_numbers), max_rows_per_filter)
+        if not fetch.scrolls:
+            return merge_hits_by_id(seed_hits, [])
+        return merge_hits_by_id(seed_hits, self._serve(fetch))
+
+    def _serve(self, fetch: _IdFetch) -> list[dict[str, Any]]:
+        self.requests += 1
+        self.naive_round_trips += fetch.scrolls
+        if self._pool is None:
+            self._fetch_pool(fetch)
+        pid_rows = self._slice("producto_id", fetch.product_ids, fetch.max_rows)
+        auth_rows = self._slice("autorizacion_sag_numero_normalizado", fetch.auth_numbers, fetch.max_rows)
+        self.rows_served += len(pid_rows) + len(auth_rows)
+        return merge_hits_by_id(pid_rows, auth_rows)
+
+    def _fetch_pool(self, first: _IdFetch) -> None:
+        planned = [*self._planned, first]
+        criteria = {
+            "producto_id": sorted({pid for fetch in planned for pid in fetch.product_ids}),
+            "autorizacion_sag_numero_normalizado": sorted({auth for fetch in planned for auth in fetch.auth_numbers}),
+        }
+        criteria = {field_name: values for field_name, values in criteria.items() if values}
+        # Con este tope cada consumidor cabe completo salvo que compitan por las mismas filas.
+        cap = sum(fetch.max_rows * fetch.scrolls for fetch in planned)
+        rows = retrieve_sag_rows_matching(self.settings, criteria, cap, limit_per_page=512)
+        self.round_trips += 1
+        self.rows_fetched += len(rows)
+        self._pool = SagRegistryTable(self.settings.qdrant_sag_collection, len(rows), rows)
+        self._pool_values = {field_name: set(values) for field_name, values in criteria.items()}
+        self._pool_complete = len(rows) < cap
+
+    def _slice(self, field_name: str, values: list[str], max_rows: int) -> list[dict[str, Any]]:
+        if not values:
+            return []
+        if self._pool_values.get(field_name, set()).issuperset(values):
+            rows = self._pool.rows_matching({field_name: values}, max_rows)
+            # El pool está en orden de scroll: si trae todas las coincidencias o
+            # al menos `max_rows`, el recorte es idéntico al de un scroll propio.
+            if self._pool_complete or len(rows) >= max_rows:
+                return rows
+        self.round_trips += 1
+        rows = retrieve_sag_rows_matching(self.settings, {field_name: values}, max_rows)
+        self.rows_fetched += len(rows)
+        return rows
+
+    def log_stats(self) -> None:
+        if not self.requests:
+            return
+        logger.info(
+            "🧮 SAG plan de lecturas | solicitudes=%s | viajes=%s (evitados=%s) | filas_leidas=%s | filas_redundantes_evitadas=%s",
+            self.requests,
+            self.round_trips,
+            max(self.naive_round_trips - self.round_trips, 0),
+            self.rows_fetched,
+            max(self.rows_served - self.rows_fetched, 0),
+        )
+
+
 # ---------------------------------------------------------------------------
 # Boost de recall con CSV
 # ---------------------------------------------------------------------------
 
+def _objective_boost_max_rows(base_top_k: int) -> int:
+    return max(base_top_k * 220, 4500)
+
+
+def _ingredient_boost_max_rows(base_top_k: int) -> int:
+    return max(base_top_k * 24, 240)
+
+
+def _plan_csv_boosts(
+    fetch_planner: "SagFetchPlanner",
+    objective_hint: str,
+    ingredient_hint: str,
+    settings: Settings,
+    base_top_k: int,
+) -> None:
+    """Registra en el planner las lecturas de los boosts CSV (los lookups se memoizan por turno)."""
+    if objective_hint:
+        product_ids, auths = find_products_by_objective(settings.sag_csv_path, objective_hint)
+        fetch_planner.plan(product_ids=product_ids, auth_numbers=auths, max_rows=_objective_boost_max_rows(base_top_k))
+    if ingredient_hint:
+        product_ids, auths = find_products_by_ingredient(settings.sag_csv_path, ingredient_hint)
+        fetch_planner.plan(product_ids=product_ids, auth_numbers=auths, max_rows=_ingredient_boost_max_rows(base_top_k))
+
+
 def _boost_with_csv_objective(
     sag_hits: list[dict[str, Any]],
     objective_hint: str,
     settings: Settings,
     base_top_k: int,
+    fetch_planner: "SagFetchPlanner",
 ) -> list[dict[str, Any]]:
     if not objective_hint:
         return sag_hits
     csv_product_ids, csv_auths = find_products_by_objective(settings.sag_csv_path, objective_hint)
     if not csv_product_ids and not csv_auths:
         return sag_hits
-    csv_rows = retrieve_sag_rows_by_ids(
-        settings=settings,
+    csv_rows = fetch_planner.rows_by_ids(
         product_ids=csv_product_ids,
         auth_numbers=csv_auths,
-        max_rows=max(base_top_k * 220, 4500),
+        max_rows=_objective_boost_max_rows(base_top_k),
     )
     if csv_rows:
         sag_hits = merge_hits_by_id(sag_hits, csv_rows)
@@ -195,17 +359,17 @@ def _boost_with_csv_ingredient(
     ingredient_hint: str,
     settings: Settings,
     base_top_k: int,
+    fetch_planner: "SagFetchPlanner",
 ) -> list[dict[str, Any]]:
     if not ingredient_hint:
         return sag_hits
     csv_product_ids, csv_auths = find_products_by_ingredient(settings.sag_csv_path, ingredient_hint)
     if not csv_product_ids and not csv_auths:
         return sag_hits
-    csv_rows = retrieve_sag_rows_by_ids(
-        settings=settings,
+    csv_rows = fetch_planner.rows_by_ids(
         product_ids=csv_product_ids,
         auth_numbers=csv_auths,
-        max_rows=max(base_top_k * 24, 240),
+        max_rows=_ingredient_boost_max_rows(base_top_k),
     )
     if csv_rows:
         sag_hits = merge_hits_by_id(sag_hits, csv_rows)
@@ -247,6 +411,7 @@ def _confirm_hits_with_csv(
     effective_user_message: str,
     settings: Settings,
     base_top_k: int,
+    fetch_planner: "SagFetchPlanner",
 ) -> list[dict[str, Any]]:
     if not sag_hits:
         return sag_hits
@@ -271,8 +436,7 @@ def _confirm_hits_with_csv(
     if not csv_product_ids and not csv_auths:
         return sag_hits
 
-    confirmed_rows = retrieve_sag_rows_by_ids(
-        settings=settings,
+    confirmed_rows = fetch_planner.rows_by_ids(
         product_ids=csv_product_ids,
         auth_numbers=csv_auths,
         max_rows=max(base_top_k * 220, 4500),
@@ -465,15 +629,31 @@ def _filter_hits_by_field(
         return hits
     tokens = meaningful_tokens(target)
 
-    out: list[dict[str, Any]] = []
-    for hit in hits:
-        payload = hit.get("payload") or {}
-        haystack = _field_text(payload, field)
+    def _matches(haystack: str) -> bool:
         if not haystack:
-            continue
+            return False
         if target in haystack or haystack in target:
-            out.append(hit)
-        elif tokens and any(tok in haystack for tok in tokens):
+            return True
+        return any(tok in haystack for tok in tokens)
+
+    # Con la tabla SAG local, el predicado se evalúa una vez por valor distinto
+    # de la columna: conviene solo si ya está memoizada o si hay al menos tantos
+    # hits como valores distintos. Los hits fuera de la tabla usan su payload.
+    table = current_sag_table()
+    mask = None
+    if table is not None and hits:
+        mask = table.cached_mask(field, target)
+        if mask is None and len(hits) >= table.cardinality(field):
+            mask = table.mask(field, _matches, predicate_key=target)
+
+    out: list[dict[str, Any]] = []
+    for hit in hits:
+        row = table.row_index(hit.get("id")) if mask is not None else None
+        if row is not None:
+            keep = bool(mask[row])
+        else:
+            keep = _matches(_field_text(hit.get("payload") or {}, field))
+        if keep:
             out.append(hit)
     return out
 
@@ -502,6 +682,13 @@ def _field_text(payload: dict[str, Any], field: str) -> str:
     return ""
 
 
+# Columnas de la tabla SAG local usadas por `_filter_hits_by_field`. La
+# composición puede venir de SAG.csv, así que se recalcula si cambia el catálogo.
+register_sag_column("ingredient", partial(_field_text, field="ingredient"), key=catalog_version)
+register_sag_column("objective", partial(_field_text, field="objective"))
+register_sag_column("crop", partial(_field_text, field="crop"))
+
+
 # ---------------------------------------------------------------------------
 # Extracción de hints desde texto de consulta
 # ---------------------------------------------------------------------------
@@ -0,0 +1,181 @@
+"""Cache de embeddings en dos niveles: LRU en memoria + SQLite opcional en disco."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from ..config import Settings
+
+PURGE_EVERY_PUTS = 256
+logger = logging.getLogger(__name__)
+
+
+def normalize_cache_text(text: str) -> str:
+    """Normaliza el texto para la llave: espacios colapsados y sin mayúsculas."""
+    return " ".join(str(text or "").split()).casefold()
+
+
+def embedding_cache_key(text: str, *, model: str, task_type: str, dim: int) -> str:
+    raw = "\x1f".join([model, task_type, str(int(dim)), normalize_cache_text(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache thread-safe de vectores float32 con TTL.
+
+    - Nivel 1: LRU en memoria acotado por cantidad de entradas.
+    - Nivel 2 (opcional): SQLite en disco, compartido entre reinicios del bot.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_seconds: int, disk_path: str = "") -> None:
+        self.max_entries = max(int(max_entries), 1)
+        self.ttl_seconds = max(int(ttl_seconds), 1)
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._puts_since_purge = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        if (disk_path or "").strip():
+            self._db = self._open_disk_store(Path(disk_path.strip()))
+
+    def _open_disk_store(self, path: Path) -> sqlite3.Connection | None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " created_at REAL NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+            db.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            db.commit()
+            logger.info("🗄️ Cache embeddings | almacenamiento en disco activo | ruta=%s", path)
+            return db
+        except sqlite3.Error:
+            logger.warning("No se pudo abrir cache de embeddings en disco (%s); se usa solo memoria.", path, exc_info=True)
+            return None
+
+    def get(self, key: str) -> np.ndarray | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, vector = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return vector
+                del self._memory[key]
+                self._counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created_at, dim, vector FROM embeddings WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None:
+                    created_at, dim, blob = row
+                    if now - float(created_at) <= self.ttl_seconds:
+                        vector = np.frombuffer(blob, dtype=np.float32, count=int(dim))
+                        self._remember(key, float(created_at), vector)
+                        self._counters["disk_hits"] += 1
+                        return vector
+                    self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._counters["expirations"] += 1
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        now = time.time()
+        vec = np.ascontiguousarray(vector, dtype=np.float32)
+        vec.setflags(write=False)
+        with self._lock:
+            self._remember(key, now, vec)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, created_at, dim, vector) VALUES (?, ?, ?, ?)",
+                    (key, now, int(vec.shape[0]), vec.tobytes()),
+                )
+                self._puts_since_purge += 1
+                if self._puts_since_purge >= PURGE_EVERY_PUTS:
+                    self._puts_since_purge = 0
+                    self._db.execute("DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._db.commit()
+            except sqlite3.Error:
+                logger.warning("No se pudo persistir embedding en disco.", exc_info=True)
+
+    def _remember(self, key: str, created_at: float, vector: np.ndarray) -> None:
+        self._memory[key] = (created_at, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "entries_in_memory": len(self._memory),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "disk_enabled": self._db is not None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache_guard = threading.Lock()
+_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache(settings: Settings) -> EmbeddingCache | None:
+    """Cache compartida del proceso; None si está desactivada por configuración."""
+    global _cache
+    if int(settings.embedding_cache_max_entries) <= 0:
+        return None
+    if _cache is not None:
+        return _cache
+    with _cache_guard:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                max_entries=settings.embedding_cache_max_entries,
+                ttl_seconds=settings.embedding_cache_ttl_seconds,
+                disk_path=settings.embedding_cache_path,
+            )
+    return _cache
+
+
+def close_embedding_cache() -> None:
+    global _cache
+    with _cache_guard:
+        cache, _cache = _cache, None
+    if cache is not None:
+        logger.info("🗄️ Cache embeddings | cierre | stats=%s", cache.stats())
+        cache.close()
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import logging
-import math
 import time
-from typing import List
+from typing import List, Sequence
 
-from google import genai
+import numpy as np
 from google.genai import types
 
 from ..config import Settings
+from ..turn_context import current_turn_context
+from .embedding_cache import embedding_cache_key, get_embedding_cache
+from .genai_clients import get_genai_client
 
 
 EMBED_MODEL = "gemini-embedding-001"
@@ -16,39 +18,98 @@ EMBED_DIM = 768
 logger = logging.getLogger(__name__)
 
 
-def _l2_normalize(vec: List[float]) -> List[float]:
+def _l2_normalize_rows(matrix: np.ndarray) -> np.ndarray:
     # Para 768/1536 Google recomienda normalizar (3072 ya viene normalizado).
     # https://ai.google.dev/gemini-api/docs/embeddings
-    norm = math.sqrt(sum((x * x) for x in vec))
-    if norm == 0.0:
-        return vec
-    return [x / norm for x in vec]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
 
 
-def embed_retrieval_query(text: str, settings: Settings) -> List[float]:
+def embed_retrieval_queries(texts: Sequence[str], settings: Settings) -> List[np.ndarray]:
     """
-    Embedding para la pregunta del usuario.
-    task_type debe ser RETRIEVAL_QUERY para RAG.
+    Embeddings RETRIEVAL_QUERY para varias consultas en una sola llamada.
+
+    - Cada texto se busca primero en la cache de embeddings.
+    - Los textos faltantes (deduplicados) se envían juntos en un único
+      `embed_content`, pagando una sola latencia de red.
+    - Devuelve vectores float32 normalizados, en el mismo orden de `texts`.
     """
-    started = time.perf_counter()
-    logger.info("🧮 Embedding | generando vector de búsqueda...")
-    client = genai.Client(api_key=settings.gemini_api_key.get_secret_value())
-
-    result = client.models.embed_content(
-        model=EMBED_MODEL,
-        contents=text,
-        config=types.EmbedContentConfig(
+    started = time.perf_counter()
+    cache = get_embedding_cache(settings)
+    keys = [
+        embedding_cache_key(
+            text,
+            model=EMBED_MODEL,
             task_type="RETRIEVAL_QUERY",
-            output_dimensionality=EMBED_DIM,
-        ),
+            dim=EMBED_DIM,
+        )
+        for text in texts
+    ]
+
+    turn = current_turn_context()
+    resolved: dict[str, np.ndarray] = {}
+    pending: dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key in resolved or key in pending:
+            continue
+        cached = turn.get("embedding", key) if turn is not None else None
+        if cached is None and cache is not None:
+            cached = cache.get(key)
+        if cached is not None:
+            resolved[key] = cached
+        else:
+            pending[key] = text
+
+    if pending:
+        logger.info("🧮 Embedding | generando %s vector(es) de búsqueda...", len(pending))
+        client = get_genai_client(settings, profile="default")
+        result = client.models.embed_content(
+            model=EMBED_MODEL,
+            contents=list(pending.values()),
+            config=types.EmbedContentConfig(
+                task_type="RETRIEVAL_QUERY",
+                output_dimensionality=EMBED_DIM,
+            ),
+        )
+        embeddings = list(result.embeddings or [])
+        if len(embeddings) != len(pending):
+            raise RuntimeError(
+                f"Gemini devolvió {len(embeddings)} embeddings para {len(pending)} consultas."
+            )
+        matrix = _l2_normalize_rows(
+            np.asarray([emb.values for emb in embeddings], dtype=np.float32)
+        )
+        for key, vec in zip(pending.keys(), matrix):
+            vec.setflags(write=False)
+            resolved[key] = vec
+            if cache is not None:
+                cache.put(key, vec)
+    if turn is not None:
+        for key, vec in resolved.items():
+            turn.put("embedding", key, vec)
+
+    logger.info(
+        "✅ Embedding listo | tiempo=%sms | consultas=%s | desde_cache=%s | llamadas_api=%s | dimensión=%s",
+        int((time.perf_counter() - started) * 1000),
+        len(texts),
+        len(resolved) - len(pending),
+        1 if pending else 0,
+        EMBED_DIM,
     )
+    return [resolved[key] for key in keys]
+
 
-    [emb] = result.embeddings
-    vec = [float(x) for x in emb.values]
-    logger.info(
-        "✅ Embedding listo | tiempo=%sms | entrada=%s chars | dimensión=%s",
-        int((time.perf_counter() - started) * 1000),
-        len(text or ""),
-        len(vec),
-    )
-    return _l2_normalize(vec)
+def embed_retrieval_query_vector(text: str, settings: Settings) -> np.ndarray:
+    """Embedding RETRIEVAL_QUERY de un solo texto (ver `embed_retrieval_queries`)."""
+    [vec] = embed_retrieval_queries([text], settings)
+    return vec
+
+
+def embed_retrieval_query(text: str, settings: Settings) -> List[float]:
+    """
+    Embedding para la pregunta del usuario.
+    task_type debe ser RETRIEVAL_QUERY para RAG.
+    Se consulta primero la cache de embeddings (memoria y disco opcional).
+    """
+    return embed_retrieval_query_vector(text, settings).tolist()
@@ -0,0 +1,124 @@
+"""Registro compartido de clientes Gemini (google-genai) por perfil de timeout."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from google import genai
+from google.genai import types
+
+from ..config import Settings
+
+PROFILES = ("router", "default", "complex", "refine")
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _PooledGenaiClient:
+    profile: str
+    timeout_ms: int
+    client: genai.Client
+    checkouts: int = 0
+
+
+_registry_guard = threading.Lock()
+_registry: dict[tuple[str, int, str], _PooledGenaiClient] = {}
+_clients_created = 0
+_clients_closed = 0
+
+
+def profile_timeout_ms(settings: Settings, profile: str) -> int:
+    """Timeout HTTP (ms) asociado a cada perfil de uso de Gemini."""
+    if profile == "router":
+        return max(int(settings.gemini_router_timeout_ms), 1000)
+    if profile == "complex":
+        return max(int(settings.gemini_complex_timeout_ms), 1000)
+    if profile == "refine":
+        return max(int(settings.gemini_refine_timeout_ms), 1000)
+    return max(int(settings.gemini_timeout_ms), 1000)
+
+
+def get_genai_client(settings: Settings, profile: str = "default") -> genai.Client:
+    """
+    Devuelve el cliente Gemini compartido para el perfil indicado.
+
+    Cada cliente mantiene su propio pool HTTP, por lo que reutilizarlo entre
+    turnos e hilos evita abrir conexiones nuevas en cada llamada.
+    """
+    global _clients_created
+    profile_key = profile if profile in PROFILES else "default"
+    timeout_ms = profile_timeout_ms(settings, profile_key)
+    api_key = settings.gemini_api_key.get_secret_value()
+    key = (
+        profile_key,
+        timeout_ms,
+        hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16],
+    )
+    with _registry_guard:
+        pooled = _registry.get(key)
+        if pooled is None:
+            pooled = _PooledGenaiClient(
+                profile=profile_key,
+                timeout_ms=timeout_ms,
+                client=genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(timeout=timeout_ms),
+                ),
+            )
+            _registry[key] = pooled
+            _clients_created += 1
+            logger.info(
+                "🔌 Gemini | cliente compartido creado | perfil=%s | timeout=%sms",
+                profile_key,
+                timeout_ms,
+            )
+        pooled.checkouts += 1
+        return pooled.client
+
+
+def genai_client_stats() -> dict[str, Any]:
+    """Métricas de reutilización de clientes Gemini por perfil."""
+    with _registry_guard:
+        clients = [
+            {
+                "profile": pooled.profile,
+                "timeout_ms": pooled.timeout_ms,
+                "checkouts": pooled.checkouts,
+            }
+            for pooled in _registry.values()
+        ]
+        return {
+            "clients_active": len(_registry),
+            "clients_created": _clients_created,
+            "clients_closed": _clients_closed,
+            "checkouts": sum(c["checkouts"] for c in clients),
+            "clients": clients,
+        }
+
+
+def close_genai_clients() -> None:
+    """Cierra todos los clientes Gemini del registro (apagado del bot)."""
+    global _clients_closed
+    stats = genai_client_stats()
+    with _registry_guard:
+        pooled_clients = list(_registry.values())
+        _registry.clear()
+    closed = 0
+    for pooled in pooled_clients:
+        try:
+            pooled.client.close()
+            closed += 1
+        except Exception:
+            logger.warning("No se pudo cerrar cliente Gemini (perfil=%s).", pooled.profile, exc_info=True)
+    with _registry_guard:
+        _clients_closed += closed
+    if pooled_clients:
+        logger.info(
+            "🔌 Gemini | clientes cerrados=%s | checkouts_totales=%s | creados=%s",
+            len(pooled_clients),
+            stats["checkouts"],
+            stats["clients_created"],
+        )
@@ -5,10 +5,10 @@ import re
 import time
 from typing import List
 
-from google import genai
 from google.genai import types
 
 from ..config import Settings
+from .genai_clients import get_genai_client
 
 GEN_MODEL_DEFAULT = "gemini-3-pro-preview"
 GEN_MODEL_FALLBACK_DEFAULT = "gemini-2.5-flash"
@@ -111,20 +111,17 @@ def _is_truncated_response(text: str, finish_reasons: list[str]) -> bool:
 def _profile_params(settings: Settings, profile: str) -> dict[str, int | float]:
     if profile == "router":
         return {
-            "timeout_ms": max(int(settings.gemini_router_timeout_ms), 1000),
             "max_output_tokens": max(int(settings.gemini_router_max_output_tokens), 128),
             "thinking_budget": max(int(settings.gemini_router_thinking_budget), 0),
             "temperature": 0.0,
         }
     if profile == "complex":
         return {
-            "timeout_ms": max(int(settings.gemini_complex_timeout_ms), 1000),
             "max_output_tokens": max(int(settings.gemini_complex_max_output_tokens), 128),
             "thinking_budget": max(int(settings.gemini_complex_thinking_budget), 0),
             "temperature": 0.25,
         }
     return {
-        "timeout_ms": max(int(settings.gemini_timeout_ms), 1000),
         "max_output_tokens": max(int(settings.gemini_max_output_tokens), 128),
         "thinking_budget": max(int(settings.gemini_thinking_budget), 0),
         "temperature": 0.3,
@@ -140,12 +137,7 @@ def generate_answer(
 ) -> str:
     started = time.perf_counter()
     params = _profile_params(settings, profile)
-    client = genai.Client(
-        api_key=settings.gemini_api_key.get_secret_value(),
-        http_options=types.HttpOptions(
-            timeout=int(params["timeout_ms"]),
-        ),
-    )
+    client = get_genai_client(settings, profile=profile)
 
     # Configurar parámetros base
     config_params = {
@@ -5,10 +5,10 @@ import re
 import time
 from pathlib import Path
 
-from google import genai
 from google.genai import types
 
 from ..config import Settings
+from .genai_clients import get_genai_client
 
 REFINE_MODEL_DEFAULT = "gemini-3-flash-preview"
 REFINE_MODEL_FALLBACK_DEFAULT = "gemini-2.5-flash"
@@ -66,12 +66,7 @@ def refine_user_question(question: str, settings: Settings) -> str:
     Output: str — consulta optimizada (texto plano)
     """
     started = time.perf_counter()
-    client = genai.Client(
-        api_key=settings.gemini_api_key.get_secret_value(),
-        http_options=types.HttpOptions(
-            timeout=max(int(settings.gemini_refine_timeout_ms), 1000),
-        ),
-    )
+    client = get_genai_client(settings, profile="refine")
     model_name = (
         settings.gemini_refine_model or REFINE_MODEL_DEFAULT
     ).strip() or REFINE_MODEL_DEFAULT
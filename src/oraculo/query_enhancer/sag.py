@@ -6,10 +6,10 @@ import time
 from dataclasses import dataclass
 from pathlib import Path
 
-from google import genai
 from google.genai import types
 
 from ..config import Settings
+from ..providers.genai_clients import get_genai_client
 from ..sources.sag_csv_lookup import (
     build_csv_query_hints_block,
     find_products_by_query,
@@ -107,10 +107,7 @@ def enhance_sag_query(
     )
     exhaustive_hint = _is_exhaustive_intent(combined_text)
 
-    client = genai.Client(
-        api_key=settings.gemini_api_key.get_secret_value(),
-        http_options=types.HttpOptions(timeout=max(int(settings.gemini_refine_timeout_ms), 1000)),
-    )
+    client = get_genai_client(settings, profile="refine")
     model_name = (settings.gemini_refine_model or ENHANCER_MODEL_DEFAULT).strip() or ENHANCER_MODEL_DEFAULT
     fallback_model = (settings.gemini_fallback_model or ENHANCER_FALLBACK_MODEL_DEFAULT).strip() or ENHANCER_FALLBACK_MODEL_DEFAULT
     enhancer_input = _render_enhancer_input(
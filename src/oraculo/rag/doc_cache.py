@@ -0,0 +1,151 @@
+"""Cache de proceso para chunks por documento CER (compartida entre usuarios)."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from ..config import Settings
+
+# Overhead aproximado por punto (dict, id, claves) al estimar bytes.
+POINT_OVERHEAD_BYTES = 96
+logger = logging.getLogger(__name__)
+
+
+def estimate_points_bytes(points: List[Dict[str, Any]]) -> int:
+    """Estimación barata del tamaño en memoria de una lista de puntos."""
+    total = 0
+    for point in points:
+        total += POINT_OVERHEAD_BYTES
+        for key, value in (point.get("payload") or {}).items():
+            total += len(key) + len(str(value))
+    return total
+
+
+class DocChunkCache:
+    """
+    LRU acotada por bytes con TTL.
+
+    Se invalida completa cuando cambia la huella de la colección
+    (points_count), p.ej. tras re-ingestar informes.
+    """
+
+    def __init__(self, *, max_bytes: int, ttl_seconds: int) -> None:
+        self.max_bytes = max(int(max_bytes), 1)
+        self.ttl_seconds = max(int(ttl_seconds), 1)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._fingerprint: Optional[tuple[Any, ...]] = None
+        self._fingerprint_checked_at = 0.0
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            created_at, nbytes, value = entry
+            if now - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self._bytes -= nbytes
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> None:
+        nbytes = max(int(nbytes), 1)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (time.time(), nbytes, value)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self._counters["evictions"] += 1
+
+    def fingerprint_due(self, interval_seconds: float) -> bool:
+        with self._lock:
+            return time.time() - self._fingerprint_checked_at >= interval_seconds
+
+    def sync_fingerprint(self, fingerprint: tuple[Any, ...]) -> bool:
+        """Registra la huella actual; limpia la cache si cambió. Devuelve True si invalidó."""
+        with self._lock:
+            self._fingerprint_checked_at = time.time()
+            changed = self._fingerprint is not None and fingerprint != self._fingerprint
+            self._fingerprint = fingerprint
+            if changed:
+                self._entries.clear()
+                self._bytes = 0
+                self._counters["invalidations"] += 1
+            return changed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache_guard = threading.Lock()
+_cache: DocChunkCache | None = None
+
+
+def get_doc_chunk_cache(settings: Settings) -> DocChunkCache | None:
+    """Cache compartida del proceso; None si está desactivada (`RAG_DOC_CACHE_MAX_BYTES=0`)."""
+    global _cache
+    if int(settings.rag_doc_cache_max_bytes) <= 0:
+        return None
+    if _cache is not None:
+        return _cache
+    with _cache_guard:
+        if _cache is None:
+            _cache = DocChunkCache(
+                max_bytes=settings.rag_doc_cache_max_bytes,
+                ttl_seconds=settings.rag_doc_cache_ttl_seconds,
+            )
+    return _cache
+
+
+def refresh_doc_cache_fingerprint(settings: Settings, qdrant: Any) -> None:
+    """
+    Compara points_count de la colección CER con la huella registrada
+    (como máximo una vez por intervalo) e invalida la cache si cambió.
+    """
+    cache = get_doc_chunk_cache(settings)
+    if cache is None:
+        return
+    if not cache.fingerprint_due(max(float(settings.rag_doc_cache_fingerprint_interval_seconds), 0.0)):
+        return
+    try:
+        info = qdrant.get_collection(settings.qdrant_collection)
+    except Exception:
+        logger.warning("No se pudo leer huella de la colección para cache de informes.", exc_info=True)
+        return
+    fingerprint = (settings.qdrant_collection, info.points_count)
+    if cache.sync_fingerprint(fingerprint):
+        logger.info("🗂️ Cache informes | colección cambió (%s) | cache invalidada", fingerprint)
+    else:
+        logger.info("🗂️ Cache informes | stats=%s", cache.stats())
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import contextvars
+import logging
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from typing import Any, Dict, List, Sequence, Set, Tuple
 
+from qdrant_client import models as qm
 from qdrant_client.http.exceptions import UnexpectedResponse
 
 from ..config import Settings
-from ..vectorstore.qdrant_client import get_qdrant_client
-from ..vectorstore.search import scroll_doc_points
+from ..vectorstore.qdrant_client import get_qdrant_call_timeout, get_qdrant_client
+from ..vectorstore.search import scroll_doc_points, scroll_points_for_docs
+from .doc_cache import estimate_points_bytes, get_doc_chunk_cache, refresh_doc_cache_fingerprint
+from .location_index import LOCATION_FIELDS, lookup_doc_location
 
+logger = logging.getLogger(__name__)
 
 # Cantidad de informes a expandir
 TOP_DOCS = 8
@@ -59,7 +67,9 @@ CORE_SECTION_NORMS_EN = {
 
 # Tablas relevantes: tratamientos/dosis/diseño/resultados
 TABLE_SECTIONS_HINTS = ("TRAT", "DOSIS", "DISENO", "DISEÑO", "RESULT", "EVAL")
-LOCATION_FIELDS = ("comuna", "localidad", "region", "ubicacion")
+
+# Fase 1 del fetch planificado: metadata suficiente para _plan_indices, sin texto.
+SKELETON_PAYLOAD_FIELDS = ["doc_id", "chunk_index", "section_norm", "chunk_type"]
 
 
 @dataclass
@@ -146,6 +156,41 @@ def _clean_location_value(value: str) -> str:
     return cleaned
 
 
+_LOCATION_CHARS = r"A-Za-zÁÉÍÓÚÑáéíóúñ'´`’.\-\s"
+_LOCATION_PATTERNS: Dict[str, List[re.Pattern[str]]] = {
+    field: [re.compile(regex, flags=re.IGNORECASE) for regex in regexes]
+    for field, regexes in {
+        "comuna": [
+            rf"comuna\s+de\s+([{_LOCATION_CHARS}]{{2,80}})",
+            rf"comuna\s+([{_LOCATION_CHARS}]{{2,80}})",
+        ],
+        "localidad": [
+            rf"localidad\s+de\s+([{_LOCATION_CHARS}]{{2,80}})",
+            rf"localidad\s+([{_LOCATION_CHARS}]{{2,80}})",
+            rf"located\s+in\s+([{_LOCATION_CHARS}]{{2,80}})",
+        ],
+        "region": [
+            rf"regi[oó]n\s+del?\s+([{_LOCATION_CHARS}]{{2,120}})",
+            rf"regi[oó]n\s+de\s+([{_LOCATION_CHARS}]{{2,120}})",
+            rf"regi[oó]n\s+([{_LOCATION_CHARS}]{{2,120}})",
+            rf"region\s+([{_LOCATION_CHARS}]{{2,120}})",
+        ],
+    }.items()
+}
+_LOCATION_STOP_RE = re.compile(
+    r"[\(\),;]| latitud| longitud| latitude| longitude|\bchile\b",
+    flags=re.IGNORECASE,
+)
+_EN_LA_COMUNA_TAIL_RE = re.compile(r"\ben\s+la\s+comuna\s+de\s+.*$", flags=re.IGNORECASE)
+_COMUNA_TAIL_RE = re.compile(r"\bcomuna\s+de\s+.*$", flags=re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_UBICACION_RE = re.compile(
+    r"(ubicad[oa]\s+en\s+[^.\n]{8,180}|located\s+in\s+[^.\n]{8,180})",
+    flags=re.IGNORECASE,
+)
+_UBICACION_STOP_RE = re.compile(r"[\(\);]| latitude| longitude", flags=re.IGNORECASE)
+
+
 def _extract_location_from_text(text: str) -> Dict[str, str]:
     """
     Extrae comuna/localidad/región desde texto libre de chunks.
@@ -155,53 +200,25 @@ def _extract_location_from_text(text: str) -> Dict[str, str]:
     if not source:
         return out
 
-    common_chars = r"A-Za-zÁÉÍÓÚÑáéíóúñ'´`’.\-\s"
-    patterns = {
-        "comuna": [
-            rf"comuna\s+de\s+([{common_chars}]{{2,80}})",
-            rf"comuna\s+([{common_chars}]{{2,80}})",
-        ],
-        "localidad": [
-            rf"localidad\s+de\s+([{common_chars}]{{2,80}})",
-            rf"localidad\s+([{common_chars}]{{2,80}})",
-            rf"located\s+in\s+([{common_chars}]{{2,80}})",
-        ],
-        "region": [
-            rf"regi[oó]n\s+del?\s+([{common_chars}]{{2,120}})",
-            rf"regi[oó]n\s+de\s+([{common_chars}]{{2,120}})",
-            rf"regi[oó]n\s+([{common_chars}]{{2,120}})",
-            rf"region\s+([{common_chars}]{{2,120}})",
-        ],
-    }
-
-    for field, regexes in patterns.items():
+    for field, regexes in _LOCATION_PATTERNS.items():
         for regex in regexes:
-            match = re.search(regex, source, flags=re.IGNORECASE)
+            match = regex.search(source)
             if match:
                 value = _clean_location_value(match.group(1))
-                value = re.split(
-                    r"[\(\),;]| latitud| longitud| latitude| longitude|\bchile\b",
-                    value,
-                    maxsplit=1,
-                    flags=re.IGNORECASE,
-                )[0].strip()
+                value = _LOCATION_STOP_RE.split(value, maxsplit=1)[0].strip()
 
                 # Limpieza específica para capturas largas.
-                value = re.sub(r"\ben\s+la\s+comuna\s+de\s+.*$", "", value, flags=re.IGNORECASE).strip()
-                value = re.sub(r"\bcomuna\s+de\s+.*$", "", value, flags=re.IGNORECASE).strip()
-                value = re.sub(r"\s+", " ", value).strip(" -")
+                value = _EN_LA_COMUNA_TAIL_RE.sub("", value).strip()
+                value = _COMUNA_TAIL_RE.sub("", value).strip()
+                value = _WHITESPACE_RE.sub(" ", value).strip(" -")
                 if value:
                     out[field] = value
                     break
     # Ubicación libre: conservar una frase corta cuando exista "ubicado en ..."
-    match_ubic = re.search(
-        r"(ubicad[oa]\s+en\s+[^.\n]{8,180}|located\s+in\s+[^.\n]{8,180})",
-        source,
-        flags=re.IGNORECASE,
-    )
+    match_ubic = _UBICACION_RE.search(source)
     if match_ubic:
         value = _clean_location_value(match_ubic.group(1))
-        value = re.split(r"[\(\);]| latitude| longitude", value, maxsplit=1, flags=re.IGNORECASE)[0].strip()
+        value = _UBICACION_STOP_RE.split(value, maxsplit=1)[0].strip()
         out["ubicacion"] = value
 
     return out
@@ -232,6 +249,19 @@ def _fill_location_from_points(
             break
 
     return completed
+
+
+def extract_doc_location(
+    points: List[Dict[str, Any]],
+    payload_ref: Dict[str, Any] | None = None,
+) -> Dict[str, str]:
+    """
+    Ubicación territorial de un informe: metadata de `payload_ref` (por defecto
+    el primer payload) completada con metadata o texto de sus chunks.
+    """
+    if payload_ref is None:
+        payload_ref = next((p["payload"] for p in points if p.get("payload")), {})
+    return _fill_location_from_points(_extract_location_fields(payload_ref), points)
 
 
 def _chunk_index(payload: Dict[str, Any]) -> int:
@@ -435,23 +465,280 @@ def _fetch_doc_points(
     settings: Settings,
     qdrant: Any,
     doc_id: str,
+    payload_fields: List[str] | None = None,
 ) -> List[Dict[str, Any]]:
     try:
-        return scroll_doc_points(
+        points = scroll_doc_points(
             client=qdrant,
             collection=settings.qdrant_collection,
             doc_id=doc_id,
-            payload_fields=None,
+            payload_fields=payload_fields,
+            timeout=get_qdrant_call_timeout(settings),
         )
     except UnexpectedResponse:
         # Fallback: usa solo los hits de ese doc si scroll falla.
-        return [
-            {"id": h.get("id"), "payload": (h.get("payload") or {})}
-            for h in hits
-            if (h.get("payload") or {}).get("doc_id") == doc_id
-        ]
+        return _hits_as_points(hits, doc_id)
+    _cache_doc_points(settings, doc_id, payload_fields, points)
+    return points
+
+
+def _points_cache_key(doc_id: str, payload_fields: List[str] | None) -> Tuple[Any, ...]:
+    return ("points", doc_id, tuple(payload_fields) if payload_fields else None)
+
+
+def _cache_doc_points(
+    settings: Settings,
+    doc_id: str,
+    payload_fields: List[str] | None,
+    points: List[Dict[str, Any]],
+) -> None:
+    cache = get_doc_chunk_cache(settings)
+    if cache is not None and points:
+        cache.put(_points_cache_key(doc_id, payload_fields), points, estimate_points_bytes(points))
+
+
+def _hits_as_points(hits: List[Dict[str, Any]], doc_id: str) -> List[Dict[str, Any]]:
+    return [
+        {"id": h.get("id"), "payload": (h.get("payload") or {})}
+        for h in hits
+        if (h.get("payload") or {}).get("doc_id") == doc_id
+    ]
+
+
+def _fetch_docs_points(
+    hits: List[Dict[str, Any]],
+    settings: Settings,
+    qdrant: Any,
+    doc_ids: List[str],
+    payload_fields: List[str] | None = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Chunks de varios documentos: primero desde la cache compartida de informes,
+    y solo los faltantes desde Qdrant.
+    """
+    cache = get_doc_chunk_cache(settings)
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    missing: List[str] = []
+    for doc_id in doc_ids:
+        cached = cache.get(_points_cache_key(doc_id, payload_fields)) if cache is not None else None
+        if cached is not None:
+            out[doc_id] = cached
+        else:
+            missing.append(doc_id)
+    if missing:
+        out.update(_fetch_docs_points_from_qdrant(hits, settings, qdrant, missing, payload_fields))
+    return out
+
+
+def _fetch_docs_points_from_qdrant(
+    hits: List[Dict[str, Any]],
+    settings: Settings,
+    qdrant: Any,
+    doc_ids: List[str],
+    payload_fields: List[str] | None = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Trae los chunks de varios documentos en paralelo (pool acotado por turno).
+
+    La latencia pasa a ser la del scroll más lento y no la suma de todos.
+    Documentos que fallan o superan el timeout usan solo sus hits.
+    Con `RAG_DOC_FETCH_STRATEGY=batched` se usa un único scroll para todos.
+    """
+    if (settings.rag_doc_fetch_strategy or "").strip().lower() == "batched" and len(doc_ids) > 1:
+        batched = _fetch_docs_points_batched(hits, settings, qdrant, doc_ids, payload_fields)
+        if batched is not None:
+            return batched
+
+    concurrency = min(max(int(settings.rag_doc_fetch_concurrency), 1), max(len(doc_ids), 1))
+    if concurrency <= 1:
+        return {
+            doc_id: _fetch_doc_points(hits, settings, qdrant, doc_id, payload_fields)
+            for doc_id in doc_ids
+        }
+
+    started = time.perf_counter()
+    timeout_s = max(float(settings.rag_doc_fetch_timeout_seconds), 0.1)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="oraculo-docfetch")
+    try:
+        futures = {
+            doc_id: executor.submit(
+                # copy_context: conserva el actor de logs del turno en los hilos.
+                contextvars.copy_context().run,
+                _fetch_doc_points,
+                hits,
+                settings,
+                qdrant,
+                doc_id,
+                payload_fields,
+            )
+            for doc_id in doc_ids
+        }
+        wait(futures.values(), timeout=timeout_s)
+
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        degraded: List[str] = []
+        for doc_id, future in futures.items():
+            if future.done() and future.exception() is None:
+                out[doc_id] = future.result()
+                continue
+            if future.done():
+                logger.warning(
+                    "Falló lectura de chunks del informe %s; se usan sus hits.",
+                    doc_id,
+                    exc_info=future.exception(),
+                )
+            else:
+                logger.warning("Timeout leyendo chunks del informe %s; se usan sus hits.", doc_id)
+            degraded.append(doc_id)
+            out[doc_id] = _hits_as_points(hits, doc_id)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(
+        "📄 Chunks por informe | documentos=%s | concurrencia=%s | tiempo=%sms | con_fallback=%s",
+        len(doc_ids),
+        concurrency,
+        int((time.perf_counter() - started) * 1000),
+        len(degraded),
+    )
+    return out
 
 
+def _fetch_docs_points_batched(
+    hits: List[Dict[str, Any]],
+    settings: Settings,
+    qdrant: Any,
+    doc_ids: List[str],
+    payload_fields: List[str] | None = None,
+) -> Dict[str, List[Dict[str, Any]]] | None:
+    """
+    Un solo scroll `doc_id` MatchAny para todos los informes elegidos.
+    Devuelve None si Qdrant rechaza el filtro (se usa el camino por documento).
+    """
+    started = time.perf_counter()
+    try:
+        by_doc = scroll_points_for_docs(
+            client=qdrant,
+            collection=settings.qdrant_collection,
+            doc_ids=doc_ids,
+            payload_fields=payload_fields,
+            timeout=get_qdrant_call_timeout(settings),
+        )
+    except UnexpectedResponse:
+        logger.warning("Scroll agrupado por doc_id falló; se usa lectura por documento.", exc_info=True)
+        return None
+
+    for doc_id in doc_ids:
+        if by_doc.get(doc_id):
+            _cache_doc_points(settings, doc_id, payload_fields, by_doc[doc_id])
+        else:
+            by_doc[doc_id] = _hits_as_points(hits, doc_id)
+    logger.info(
+        "📄 Chunks por informe | estrategia=batched | documentos=%s | puntos=%s | tiempo=%sms",
+        len(doc_ids),
+        sum(len(points) for points in by_doc.values()),
+        int((time.perf_counter() - started) * 1000),
+    )
+    return by_doc
+
+
+def _fetch_docs_points_planned(
+    hits: List[Dict[str, Any]],
+    settings: Settings,
+    qdrant: Any,
+    chosen: List[Tuple[str, int]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Fetch en dos fases:
+    1) Esqueleto de cada informe (chunk_index/section_norm/chunk_type, sin texto).
+    2) Solo los chunk_index planificados por `_plan_indices`, con payload completo.
+
+    `_pack_doc` sobre los chunks planificados produce la misma selección que
+    sobre el informe completo, pero se transfiere una fracción del texto.
+    """
+    started = time.perf_counter()
+    doc_ids = [doc_id for doc_id, _ in chosen]
+    skeletons = _fetch_docs_points(hits, settings, qdrant, doc_ids, SKELETON_PAYLOAD_FIELDS)
+
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    plans: Dict[str, List[int]] = {}
+    for doc_id, best_cidx in chosen:
+        skeleton = skeletons.get(doc_id) or []
+        if any(_best_text(p.get("payload") or {}) for p in skeleton):
+            # Ya son hits completos (fallback del esqueleto): no hay segunda fase.
+            out[doc_id] = skeleton
+            continue
+        existing = {_chunk_index(p["payload"]) for p in skeleton}
+        plan = [idx for idx in _plan_indices(skeleton, best_cidx) if idx in existing]
+        if plan:
+            plans[doc_id] = plan
+        else:
+            out[doc_id] = _hits_as_points(hits, doc_id)
+
+    # Chunks con texto ya cacheados (por doc_id -> chunk_index) no se vuelven a pedir.
+    cache = get_doc_chunk_cache(settings)
+    known: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    missing: Dict[str, List[int]] = {}
+    for doc_id, plan in plans.items():
+        cached = cache.get(("chunks", doc_id)) if cache is not None else None
+        known[doc_id] = dict(cached or {})
+        pending = [idx for idx in plan if idx not in known[doc_id]]
+        if pending:
+            missing[doc_id] = pending
+
+    failed: Set[str] = set()
+    if missing:
+        try:
+            fetched = scroll_points_for_docs(
+                client=qdrant,
+                collection=settings.qdrant_collection,
+                doc_ids=list(missing),
+                extra_filter=qm.Filter(
+                    should=[
+                        qm.Filter(
+                            must=[
+                                qm.FieldCondition(key="doc_id", match=qm.MatchValue(value=doc_id)),
+                                qm.FieldCondition(key="chunk_index", match=qm.MatchAny(any=pending)),
+                            ]
+                        )
+                        for doc_id, pending in missing.items()
+                    ]
+                ),
+                is_doc_complete=lambda doc_id, points: len(points) >= len(missing[doc_id]),
+                payload_fields=None,
+                timeout=get_qdrant_call_timeout(settings),
+            )
+        except UnexpectedResponse:
+            logger.warning("Fetch planificado por chunk_index falló; se usan los hits.", exc_info=True)
+            fetched = {}
+        for doc_id in missing:
+            points = fetched.get(doc_id) or []
+            if not points:
+                failed.add(doc_id)
+                continue
+            for point in points:
+                known[doc_id].setdefault(_chunk_index(point["payload"]), point)
+            if cache is not None:
+                chunks = known[doc_id]
+                cache.put(("chunks", doc_id), chunks, estimate_points_bytes(list(chunks.values())))
+
+    for doc_id, plan in plans.items():
+        if doc_id in failed:
+            out[doc_id] = _hits_as_points(hits, doc_id)
+        else:
+            out[doc_id] = [known[doc_id][idx] for idx in plan if idx in known[doc_id]]
+
+    logger.info(
+        "📄 Chunks planificados | documentos=%s | esqueleto=%s | chunks_con_texto=%s | pedidos_a_qdrant=%s | tiempo=%sms",
+        len(doc_ids),
+        sum(len(points) for points in skeletons.values()),
+        sum(len(plan) for plan in plans.values()),
+        sum(len(pending) for pending in missing.values()),
+        int((time.perf_counter() - started) * 1000),
+    )
+    return out
+
+
 def build_doc_contexts_from_hits(
     hits: List[Dict[str, Any]],
     settings: Settings,
@@ -481,13 +768,42 @@ def build_doc_contexts_from_hits(
     per_doc_char_budget = _doc_char_budget(settings, docs_count=len(chosen))
 
     qdrant = get_qdrant_client(settings)
-    out: List[DocContext] = []
-
-    for doc_id, (_score, best_cidx, payload_ref) in chosen:
-        location = _extract_location_fields(payload_ref)
-        points = _fetch_doc_points(hits, settings, qdrant, doc_id)
-
-        location = _fill_location_from_points(location, points)
+    refresh_doc_cache_fingerprint(settings, qdrant)
+    if settings.rag_doc_planned_fetch:
+        points_by_doc = _fetch_docs_points_planned(
+            hits,
+            settings,
+            qdrant,
+            [(doc_id, best_cidx) for doc_id, (_score, best_cidx, _payload) in chosen],
+        )
+    else:
+        points_by_doc = _fetch_docs_points(hits, settings, qdrant, [doc_id for doc_id, _ in chosen])
+
+    locations: Dict[str, Dict[str, str]] = {}
+    unresolved: List[str] = []
+    for doc_id, (_score, _best_cidx, payload_ref) in chosen:
+        location = _extract_location_fields(payload_ref)
+        known_location = lookup_doc_location(settings, doc_id)
+        if known_location is not None:
+            # Extraída offline sobre todo el informe: no hace falta recorrer chunks.
+            locations[doc_id] = _merge_location(location, known_location)
+            continue
+        filled = _fill_location_from_points(location, points_by_doc[doc_id])
+        if settings.rag_doc_planned_fetch and not all(filled.values()):
+            # Los chunks planificados no alcanzaron: extracción sobre el informe completo.
+            unresolved.append(doc_id)
+        locations[doc_id] = filled
+    if unresolved:
+        full_points = _fetch_docs_points(hits, settings, qdrant, unresolved)
+        for doc_id in unresolved:
+            payload_ref = doc_best[doc_id][2]
+            locations[doc_id] = extract_doc_location(full_points[doc_id], payload_ref)
+        logger.info("📍 Ubicación desde informe completo | documentos=%s", len(unresolved))
+
+    out: List[DocContext] = []
+    for doc_id, (_score, best_cidx, payload_ref) in chosen:
+        location = locations[doc_id]
+        points = points_by_doc[doc_id]
 
         chunks = _pack_doc(
             points,
@@ -0,0 +1,170 @@
+"""
+Sidecars JSON por informe CER construidos offline desde Qdrant.
+
+Comparten formato (`version`, `collection`, `built_at`, `docs`), escritura
+atómica, carga cacheada por mtime/tamaño y reconstrucción incremental por
+`doc_id`; cada índice solo aporta cómo armar la entrada de un informe.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from ..config import Settings
+from ..vectorstore.qdrant_client import get_qdrant_client
+from ..vectorstore.search import count_points_by_payload_value, scroll_doc_points
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+EntryBuilder = Callable[[List[Dict[str, Any]]], Dict[str, Any]]
+
+_sidecar_guard = threading.Lock()
+_loaded: dict[tuple[str, str], tuple[tuple[int, int], Any]] = {}
+
+
+def read_snapshot(path: Path, version: int) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    if int(data.get("version") or 0) != version:
+        raise ValueError(f"versión de índice no soportada: {data.get('version')}")
+    return data
+
+
+def write_json_snapshot(path: Path, data: Dict[str, Any]) -> None:
+    """Escritura atómica (archivo temporal + replace) de un snapshot JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        os.replace(tmp_name, path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_sidecar(
+    path: Path,
+    version: int,
+    collection: str,
+    label: str,
+    parse: Callable[[Dict[str, Any]], T],
+) -> Optional[T]:
+    """
+    Lee el snapshot y lo transforma con `parse` (cacheado por ruta, colección,
+    mtime y tamaño). Devuelve None si no existe, no se puede leer o fue
+    construido sobre otra colección distinta de `collection`.
+    """
+    if not path.is_file():
+        return None
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache_key = (str(path), collection)
+    with _sidecar_guard:
+        cached = _loaded.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    parsed: Optional[T] = None
+    try:
+        data = read_snapshot(path, version)
+    except Exception:
+        logger.warning("No se pudo leer índice de %s %s.", label, path, exc_info=True)
+    else:
+        snapshot_collection = str(data.get("collection") or "")
+        if snapshot_collection != collection:
+            logger.warning(
+                "⚠️ Índice de %s ignorado: construido sobre '%s' y la colección activa es '%s' | ruta=%s",
+                label,
+                snapshot_collection,
+                collection,
+                path,
+            )
+        else:
+            parsed = parse(data)
+            logger.info(
+                "🗂️ Índice de %s cargado | informes=%s | construido=%s | ruta=%s",
+                label,
+                len(data.get("docs") or {}),
+                data.get("built_at") or "",
+                path,
+            )
+    with _sidecar_guard:
+        _loaded[cache_key] = (signature, parsed)
+    return parsed
+
+
+def build_sidecar(
+    settings: Settings,
+    path: Path,
+    version: int,
+    build_entry: EntryBuilder,
+    *,
+    label: str,
+    full: bool = False,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    Construye o refresca un sidecar con `build_entry(points)` por informe.
+
+    Incremental por defecto: solo reprocesa informes nuevos o cuyo número de
+    puntos cambió, y elimina los que ya no están en la colección.
+    """
+    started = time.perf_counter()
+    qdrant = get_qdrant_client(settings)
+
+    previous: Dict[str, Dict[str, Any]] = {}
+    if not full and path.exists():
+        try:
+            snapshot = read_snapshot(path, version)
+            if snapshot.get("collection") == settings.qdrant_collection:
+                previous = dict(snapshot.get("docs") or {})
+        except Exception:
+            logger.warning("Índice de %s previo ilegible; se reconstruye completo.", label, exc_info=True)
+
+    counts = count_points_by_payload_value(qdrant, settings.qdrant_collection, "doc_id")
+    docs: Dict[str, Dict[str, Any]] = {}
+    rebuilt = 0
+    for doc_id, count in sorted(counts.items()):
+        entry = previous.get(doc_id)
+        if entry is not None and int(entry.get("points_count") or -1) == count:
+            docs[doc_id] = entry
+            continue
+        points = scroll_doc_points(
+            client=qdrant,
+            collection=settings.qdrant_collection,
+            doc_id=doc_id,
+            max_points=max(count, 1),
+        )
+        docs[doc_id] = {**build_entry(points), "points_count": len(points)}
+        rebuilt += 1
+
+    write_json_snapshot(
+        path,
+        {
+            "version": version,
+            "collection": settings.qdrant_collection,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "docs": docs,
+        },
+    )
+    stats = {
+        "docs": len(docs),
+        "rebuilt": rebuilt,
+        "reused": len(docs) - rebuilt,
+        "removed": len(set(previous) - set(docs)),
+    }
+    logger.info(
+        "🗂️ Índice de %s escrito | ruta=%s | tiempo=%sms | %s",
+        label,
+        path,
+        int((time.perf_counter() - started) * 1000),
+        stats,
+    )
+    return docs, stats
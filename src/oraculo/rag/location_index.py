@@ -0,0 +1,53 @@
+"""
+Índice sidecar de ubicación por informe CER (junto a CER.csv).
+
+La extracción de comuna/localidad/región/ubicación recorre el texto de todos
+los chunks; se hace una vez offline (`scripts/build_location_index.py`, con
+`doc_context.extract_doc_location` como constructor por informe) y en el
+turno solo se consulta por `doc_id`.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import Settings
+from .doc_sidecar import load_sidecar
+
+INDEX_VERSION = 1
+LOCATION_FIELDS = ("comuna", "localidad", "region", "ubicacion")
+
+
+def location_index_path(settings: Settings) -> Path:
+    """Ruta del sidecar: `CER_LOCATION_INDEX_PATH` o `<CER.csv>.locations.json`."""
+    configured = (settings.cer_location_index_path or "").strip()
+    if configured:
+        return Path(configured)
+    csv_path = Path(settings.cer_csv_path)
+    return csv_path.with_name(f"{csv_path.stem}.locations.json")
+
+
+def _parse_locations(data: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    return {
+        str(doc_id): {field: str(entry.get(field) or "") for field in LOCATION_FIELDS}
+        for doc_id, entry in (data.get("docs") or {}).items()
+    }
+
+
+def load_location_index(settings: Settings) -> Dict[str, Dict[str, str]]:
+    """
+    Mapa doc_id -> ubicación (cacheado por mtime/tamaño del archivo).
+    Vacío si el sidecar falta, es ilegible o fue construido sobre otra colección.
+    """
+    return load_sidecar(
+        location_index_path(settings),
+        INDEX_VERSION,
+        settings.qdrant_collection,
+        "ubicaciones",
+        _parse_locations,
+    ) or {}
+
+
+def lookup_doc_location(settings: Settings, doc_id: str) -> Optional[Dict[str, str]]:
+    """Ubicación precalculada del informe, o None si no está indexado."""
+    return load_location_index(settings).get(str(doc_id or "").strip())
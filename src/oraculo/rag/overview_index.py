@@ -0,0 +1,149 @@
+"""
+Índice local de overviews por informe CER (snapshot JSON).
+
+Se construye offline desde los chunks `doc_overview`/`conclusion_overview`
+de Qdrant (ver `scripts/build_overview_index.py`) y permite armar el listado
+de ensayos sin expandir cada documento en el turno.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config import Settings
+from .doc_context import (
+    DocContext,
+    _best_text,
+    _chunk_index,
+    _chunk_type,
+    _payload_get,
+    _section_norm,
+    extract_doc_location,
+)
+from .doc_sidecar import build_sidecar, load_sidecar
+
+INDEX_VERSION = 1
+OVERVIEW_CHUNK_TYPES = {"doc_overview", "conclusion_overview"}
+OVERVIEW_SECTION_HINTS = ("OBJETIVO", "RESUMEN", "CONCLUSION", "CONCLUSIÓN", "OBJECTIVE", "ABSTRACT")
+MAX_SECTION_CHUNKS = 4
+METADATA_FIELDS = ("pdf_filename", "temporada", "cliente", "producto", "especie", "variedad")
+
+
+@dataclass(slots=True)
+class OverviewIndex:
+    collection: str
+    built_at: str
+    docs: Dict[str, Dict[str, Any]]
+    by_pdf: Dict[str, str] = field(default_factory=dict)
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.docs.get(str(doc_id or "").strip())
+
+    def get_by_pdf(self, pdf_filename: str) -> Optional[Dict[str, Any]]:
+        doc_id = self.by_pdf.get(str(pdf_filename or "").strip().lower())
+        return self.docs.get(doc_id) if doc_id else None
+
+
+def _parse_index(data: Dict[str, Any]) -> OverviewIndex:
+    docs = {str(k): v for k, v in (data.get("docs") or {}).items()}
+    return OverviewIndex(
+        collection=str(data.get("collection") or ""),
+        built_at=str(data.get("built_at") or ""),
+        docs=docs,
+        by_pdf={
+            str(entry.get("pdf_filename") or "").strip().lower(): doc_id
+            for doc_id, entry in docs.items()
+            if str(entry.get("pdf_filename") or "").strip()
+        },
+    )
+
+
+def load_overview_index(path: str, collection: str) -> Optional[OverviewIndex]:
+    """
+    Carga el snapshot (cacheado por ruta, mtime y tamaño).
+    Devuelve None si no existe, no se puede leer o fue construido sobre
+    otra colección distinta de `collection`.
+    """
+    if not str(path or "").strip():
+        return None
+    return load_sidecar(Path(path), INDEX_VERSION, collection, "overviews", _parse_index)
+
+
+def doc_context_from_entry(doc_id: str, entry: Dict[str, Any]) -> DocContext:
+    """DocContext liviano (solo chunks de overview) desde una entrada del índice."""
+    return DocContext(
+        doc_id=doc_id,
+        pdf_filename=str(entry.get("pdf_filename") or ""),
+        temporada=str(entry.get("temporada") or ""),
+        cliente=str(entry.get("cliente") or ""),
+        producto=str(entry.get("producto") or ""),
+        especie=str(entry.get("especie") or ""),
+        variedad=str(entry.get("variedad") or ""),
+        comuna=str(entry.get("comuna") or ""),
+        localidad=str(entry.get("localidad") or ""),
+        region=str(entry.get("region") or ""),
+        ubicacion=str(entry.get("ubicacion") or ""),
+        chunks=[dict(chunk) for chunk in entry.get("overview_chunks") or []],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Construcción (CLI)
+# ---------------------------------------------------------------------------
+
+def _compact_chunk(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "chunk_index": _chunk_index(payload),
+        "chunk_type": _payload_get(payload, "chunk_type"),
+        "page_number": payload.get("page_number"),
+        "section_norm": _payload_get(payload, "section_norm"),
+        "heading_path": _payload_get(payload, "heading_path"),
+        "text": _best_text(payload),
+    }
+
+
+def _overview_chunks(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Chunks de overview del informe; si no existen, secciones objetivo/resumen/
+    conclusión y, en último caso, los dos primeros chunks con texto.
+    """
+    ordered = sorted(
+        (p["payload"] for p in points if _best_text(p.get("payload") or {})),
+        key=_chunk_index,
+    )
+    selected = [pay for pay in ordered if _chunk_type(pay) in OVERVIEW_CHUNK_TYPES]
+    if not selected:
+        selected = [
+            pay for pay in ordered
+            if any(hint in _section_norm(pay).upper() for hint in OVERVIEW_SECTION_HINTS)
+        ][:MAX_SECTION_CHUNKS]
+    if not selected:
+        selected = ordered[:2]
+    return [_compact_chunk(pay) for pay in selected]
+
+
+def _build_entry(points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    payload_ref = next((p["payload"] for p in points if p.get("payload")), {})
+    entry: Dict[str, Any] = {field_name: _payload_get(payload_ref, field_name) for field_name in METADATA_FIELDS}
+    entry.update(extract_doc_location(points, payload_ref))
+    entry["overview_chunks"] = _overview_chunks(points)
+    return entry
+
+
+def build_overview_index(settings: Settings, path: str = "", full: bool = False) -> Dict[str, int]:
+    """
+    Construye o refresca el índice de overviews.
+
+    Incremental por defecto: solo reprocesa informes nuevos o cuyo número de
+    puntos cambió, y elimina los que ya no están en la colección.
+    """
+    _docs, stats = build_sidecar(
+        settings,
+        Path(path or settings.cer_overview_index_path),
+        INDEX_VERSION,
+        _build_entry,
+        label="overviews",
+        full=full,
+    )
+    return stats
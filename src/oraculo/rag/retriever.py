@@ -1,32 +1,34 @@
 from __future__ import annotations
 
+import json
 import logging
+import threading
 import time
 import unicodedata
 from typing import Any, Dict, List, Tuple
 
+import numpy as np
+from qdrant_client import QdrantClient
 from qdrant_client import models as qm
+from qdrant_client.http.exceptions import UnexpectedResponse
 
 from ..config import Settings
-from ..providers.embeddings import embed_retrieval_query
+from ..providers.embeddings import embed_retrieval_query_vector
 from ..query_enhancer import enhance_cer_query, enhance_sag_query
-from ..vectorstore.qdrant_client import get_qdrant_client
-from ..vectorstore.search import query_top_chunks, scroll_points_by_filter
+from .sag_table import SagRegistryTable, current_sag_table, schedule_sag_table_sync
+from ..vectorstore.qdrant_client import get_qdrant_call_timeout, get_qdrant_client
+from ..vectorstore.payload_norm import CER_NORM_FIELDS, collection_is_normalized, match_any_condition
+from ..vectorstore.search import query_top_chunks, query_top_groups, scroll_points_by_filter
+from ..vectorstore.vector_adapter import adapt_query_vector
 
 logger = logging.getLogger(__name__)
 
-
-def _adapt_query_vector_dim(
-    query_vector: List[float],
-    target_dim: int,
-) -> List[float]:
-    current_dim = len(query_vector)
-    if current_dim == target_dim:
-        return query_vector
-    if current_dim < target_dim:
-        padded = list(query_vector) + [0.0] * (target_dim - current_dim)
-        return padded
-    return list(query_vector[:target_dim])
+# Colecciones donde Qdrant rechazó la búsqueda agrupada (p.ej. sin índice doc_id):
+# colección -> momento del rechazo. Se reintenta pasado GROUPING_RETRY_SECONDS.
+GROUPING_UNSUPPORTED_STATUS = frozenset({400, 404, 422})
+GROUPING_RETRY_SECONDS = 600.0
+_grouping_guard = threading.Lock()
+_grouping_unsupported: dict[str, float] = {}
 
 
 def _select_top_unique_docs(
@@ -94,17 +96,15 @@ def retrieve(
     rewritten_query = enhancement.enhanced_query or (question or "").strip()
 
     # 2) Generar embedding de la consulta optimizada.
-    query_vector = embed_retrieval_query(rewritten_query, settings)
-    query_vector = _adapt_query_vector_dim(
-        query_vector,
-        int(settings.qdrant_cer_chunks_vector_dim),
-    )
+    query_vector = embed_retrieval_query_vector(rewritten_query, settings)
+    query_vector = adapt_query_vector(settings, query_vector, settings.qdrant_collection)
 
     # 3) Búsqueda vectorial en Qdrant (con filtro opcional por metadata CER).
     qdrant = get_qdrant_client(settings)
     query_filter = _build_cer_query_filter(
         csv_signals=(enhancement.csv_signals if enhancement else {}),
         csv_pdf_filenames=(enhancement.csv_pdf_filenames if enhancement else set()),
+        canonical=collection_is_normalized(settings, settings.qdrant_collection, CER_NORM_FIELDS),
     )
     effective_top_k = max(1, int(top_k))
     if enhancement and enhancement.exhaustive_hint and enhancement.matched_records_count > effective_top_k:
@@ -118,22 +118,25 @@ def retrieve(
         candidate_k,
         "si" if query_filter else "no",
     )
-    raw_hits = query_top_chunks(
-        client=qdrant,
-        collection=settings.qdrant_collection,
+    raw_hits, retrieval_mode = _query_cer_candidates(
+        qdrant=qdrant,
+        settings=settings,
         query_vector=query_vector,
-        top_k=candidate_k,
         query_filter=query_filter,
+        effective_top_k=effective_top_k,
+        candidate_k=candidate_k,
     )
+    expected_hits = effective_top_k if retrieval_mode == "grouped" else candidate_k
 
     # 4) Refuerzo de recall por scroll filtrado para solicitudes amplias.
-    if query_filter and len(raw_hits) < candidate_k:
+    if query_filter and len(raw_hits) < expected_hits:
         extra_points = scroll_points_by_filter(
             client=qdrant,
             collection=settings.qdrant_collection,
             query_filter=query_filter,
             limit_per_page=256,
             max_points=max(effective_top_k * 20, 300),
+            timeout=get_qdrant_call_timeout(settings),
         )
         extra_hits = [{"id": p.get("id"), "score": 0.0, "payload": p.get("payload") or {}} for p in extra_points]
         raw_hits = _merge_hits_by_id(raw_hits, extra_hits)
@@ -152,11 +155,104 @@ def retrieve(
     return rewritten_query, hits
 
 
+def _payload_bytes(hits: List[Dict[str, Any]]) -> int:
+    return sum(
+        len(json.dumps(hit.get("payload") or {}, ensure_ascii=False, default=str).encode("utf-8"))
+        for hit in hits
+    )
+
+
+def _query_cer_candidates(
+    *,
+    qdrant: QdrantClient,
+    settings: Settings,
+    query_vector: np.ndarray,
+    query_filter: qm.Filter | None,
+    effective_top_k: int,
+    candidate_k: int,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Candidatos CER para la consulta.
+
+    - `grouped`: Qdrant agrupa por `doc_id` y devuelve el mejor chunk por documento.
+    - `overfetch`: trae `candidate_k` chunks y la deduplicación ocurre en cliente.
+
+    Si la colección no soporta agrupación se recuerda y se usa `overfetch`.
+    """
+    collection = settings.qdrant_collection
+    mode = (settings.rag_cer_retrieval_mode or "").strip().lower()
+    with _grouping_guard:
+        rejected_at = _grouping_unsupported.get(collection)
+        grouping_supported = rejected_at is None or time.time() - rejected_at >= GROUPING_RETRY_SECONDS
+
+    if mode == "grouped" and grouping_supported:
+        try:
+            hits = query_top_groups(
+                client=qdrant,
+                collection=collection,
+                query_vector=query_vector,
+                group_by="doc_id",
+                limit=effective_top_k,
+                group_size=1,
+                query_filter=query_filter,
+                timeout=get_qdrant_call_timeout(settings),
+            )
+            if logger.isEnabledFor(logging.DEBUG):
+                received = _payload_bytes(hits)
+                avg_bytes = received / len(hits) if hits else 0.0
+                logger.debug(
+                    "📦 Qdrant CER | modo=grouped | grupos=%s | payload_bytes=%s | ahorro_estimado=%s bytes vs %s candidatos",
+                    len(hits),
+                    received,
+                    int(avg_bytes * max(candidate_k - len(hits), 0)),
+                    candidate_k,
+                )
+            with _grouping_guard:
+                _grouping_unsupported.pop(collection, None)
+            return hits, "grouped"
+        except UnexpectedResponse as exc:
+            # Solo respuestas de "no soportado"; 408/429 y similares son transitorias.
+            if exc.status_code is not None and int(exc.status_code) in GROUPING_UNSUPPORTED_STATUS:
+                with _grouping_guard:
+                    _grouping_unsupported[collection] = time.time()
+            logger.warning(
+                "Búsqueda agrupada no disponible en %s (status=%s); se usa overfetch.",
+                collection,
+                exc.status_code,
+            )
+        except Exception:
+            logger.warning("Falló búsqueda agrupada en %s; se usa overfetch.", collection, exc_info=True)
+
+    raw_hits = query_top_chunks(
+        client=qdrant,
+        collection=collection,
+        query_vector=query_vector,
+        top_k=candidate_k,
+        query_filter=query_filter,
+        timeout=get_qdrant_call_timeout(settings),
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        received = _payload_bytes(raw_hits)
+        kept = _payload_bytes(_select_top_unique_docs(raw_hits, top_k_docs=effective_top_k))
+        logger.debug(
+            "📦 Qdrant CER | modo=overfetch | hits=%s | payload_bytes=%s | descartados_por_dedupe=%s bytes",
+            len(raw_hits),
+            received,
+            received - kept,
+        )
+    return raw_hits, "overfetch"
+
+
 def _build_cer_query_filter(
     *,
     csv_signals: dict[str, set[str]],
     csv_pdf_filenames: set[str],
+    canonical: bool = False,
 ) -> qm.Filter | None:
+    """
+    Filtro `should` por metadata CER. Con `canonical`, un MatchAny por campo
+    sobre los `*_norm` migrados; si no, MatchValue por cada variante de grafía.
+    """
     if not csv_signals and not csv_pdf_filenames:
         return None
 
@@ -166,6 +262,20 @@ def _build_cer_query_filter(
     productos = sorted(str(v).strip() for v in csv_signals.get("productos", set()) if str(v).strip())[:6]
     variedades = sorted(str(v).strip() for v in csv_signals.get("variedades", set()) if str(v).strip())[:6]
     clientes = sorted(str(v).strip() for v in csv_signals.get("clientes", set()) if str(v).strip())[:4]
+    pdf_filenames = sorted(str(v).strip() for v in csv_pdf_filenames if str(v).strip())[:100]
+
+    if canonical:
+        for field, values in (
+            ("especie", especies),
+            ("producto", productos),
+            ("variedad", variedades),
+            ("cliente", clientes),
+            ("pdf_filename", pdf_filenames),
+        ):
+            condition = match_any_condition(field, values)
+            if condition is not None:
+                should.append(condition)
+        return qm.Filter(should=should) if should else None
 
     if especies:
         should.extend(
@@ -191,10 +301,10 @@ def _build_cer_query_filter(
             for value in clientes
             for variant in _payload_value_variants(value)
         )
-    if csv_pdf_filenames:
+    if pdf_filenames:
         should.extend(
             qm.FieldCondition(key="pdf_filename", match=qm.MatchValue(value=variant))
-            for value in sorted(str(v).strip() for v in csv_pdf_filenames if str(v).strip())[:100]
+            for value in pdf_filenames
             for variant in _payload_value_variants(value)
         )
 
@@ -298,6 +408,7 @@ def retrieve_sag(
     Recupera coincidencias relevantes desde la colección SAG.
     """
     started = time.perf_counter()
+    schedule_sag_table_sync(settings)
 
     enhancement = enhance_sag_query(
         user_message=refined_query,
@@ -306,13 +417,10 @@ def retrieve_sag(
     )
     query_text = enhancement.enhanced_query or (refined_query or "").strip()
 
-    query_vector = embed_retrieval_query(query_text, settings)
-    source_dim = len(query_vector)
-    query_vector = _adapt_query_vector_dim(
-        query_vector,
-        int(settings.qdrant_sag_vector_dim),
-    )
-    target_dim = len(query_vector)
+    query_vector = embed_retrieval_query_vector(query_text, settings)
+    source_dim = int(query_vector.shape[0])
+    query_vector = adapt_query_vector(settings, query_vector, settings.qdrant_sag_collection)
+    target_dim = int(query_vector.shape[0])
     qdrant = get_qdrant_client(settings)
     query_filter = _build_sag_query_filter(
         product_ids=(enhancement.csv_product_ids if enhancement else set()),
@@ -336,6 +444,7 @@ def retrieve_sag(
         query_vector=query_vector,
         top_k=candidate_k,
         query_filter=query_filter,
+        timeout=get_qdrant_call_timeout(settings),
     )
 
     if query_filter and enhancement and (enhancement.csv_product_ids or enhancement.csv_auth_numbers):
@@ -367,110 +476,53 @@ def _build_sag_query_filter(
     product_ids: set[str],
     auth_numbers: set[str],
 ) -> qm.Filter | None:
-    pid_filters = [
-        qm.FieldCondition(key="producto_id", match=qm.MatchValue(value=pid))
-        for pid in sorted(str(x).strip() for x in product_ids if str(x).strip())[:200]
+    pids = sorted({str(x).strip() for x in product_ids if str(x).strip()})[:200]
+    auths = sorted({str(x).strip() for x in auth_numbers if str(x).strip()})[:200]
+    should = [
+        qm.FieldCondition(key=field, match=qm.MatchAny(any=values))
+        for field, values in (("producto_id", pids), ("autorizacion_sag_numero_normalizado", auths))
+        if values
     ]
-    auth_filters = [
-        qm.FieldCondition(
-            key="autorizacion_sag_numero_normalizado",
-            match=qm.MatchValue(value=auth),
-        )
-        for auth in sorted(str(x).strip() for x in auth_numbers if str(x).strip())[:200]
-    ]
-    should = [*pid_filters, *auth_filters]
     if not should:
         return None
     return qm.Filter(should=should)
 
 
-def retrieve_sag_rows_for_products(
-    seed_hits: List[Dict[str, Any]],
+def _local_sag_table(settings: Settings) -> SagRegistryTable | None:
+    table = current_sag_table()
+    if table is not None and table.collection == settings.qdrant_sag_collection:
+        return table
+    return None
+
+
+def retrieve_sag_rows_matching(
     settings: Settings,
-    max_rows_per_filter: int = 120,
+    criteria: Dict[str, List[str]],
+    max_points: int,
+    limit_per_page: int = 256,
 ) -> List[Dict[str, Any]]:
     """
-    Enriquece resultados SAG recuperando todas las filas/chunks asociadas
-    a los productos detectados (por producto_id y autorización SAG).
+    Filas SAG con algún campo de `criteria` igual a alguno de sus valores,
+    en orden de scroll y hasta `max_points`: desde la tabla local si está
+    sincronizada; si no, un scroll en Qdrant con `should` de MatchValue.
     """
-    if not seed_hits:
-        return []
-
-    started = time.perf_counter()
-    qdrant = get_qdrant_client(settings)
-    collection = settings.qdrant_sag_collection
-
-    merged: List[Dict[str, Any]] = []
-    seen_ids: set[str] = set()
-
-    def _add(hit: Dict[str, Any]) -> None:
-        hid = str(hit.get("id") or "")
-        if hid and hid in seen_ids:
-            return
-        if hid:
-            seen_ids.add(hid)
-        merged.append(hit)
-
-    product_ids: set[str] = set()
-    auth_numbers: set[str] = set()
-
-    for hit in seed_hits:
-        _add(hit)
-        payload = hit.get("payload") or {}
-        product_id = str(payload.get("producto_id") or "").strip()
-        auth = str(payload.get("autorizacion_sag_numero_normalizado") or "").strip()
-        if product_id:
-            product_ids.add(product_id)
-        if auth:
-            auth_numbers.add(auth)
-
-    max_product_terms = max(1, min(len(product_ids), 500))
-    max_auth_terms = max(1, min(len(auth_numbers), 500))
-
-    product_filters = [
-        qm.FieldCondition(key="producto_id", match=qm.MatchValue(value=product_id))
-        for product_id in sorted(product_ids)[:max_product_terms]
-    ]
-    if product_filters:
-        points = scroll_points_by_filter(
-            client=qdrant,
-            collection=collection,
-            query_filter=qm.Filter(should=product_filters),
-            limit_per_page=256,
-            max_points=max_rows_per_filter,
-        )
-        for p in points:
-            _add(p)
-
-    auth_filters = [
-        qm.FieldCondition(
-            key="autorizacion_sag_numero_normalizado",
-            match=qm.MatchValue(value=auth),
-        )
-        for auth in sorted(auth_numbers)[:max_auth_terms]
-    ]
-    if auth_filters:
-        points = scroll_points_by_filter(
-            client=qdrant,
-            collection=collection,
-            query_filter=qm.Filter(should=auth_filters),
-            limit_per_page=256,
-            max_points=max_rows_per_filter,
-        )
-        for p in points:
-            _add(p)
-
-    logger.info(
-        "📦 SAG enrich | seed=%s | producto_ids=%s/%s | autorizaciones=%s/%s | filas_totales=%s | tiempo=%sms",
-        len(seed_hits),
-        min(len(product_ids), max_product_terms),
-        len(product_ids),
-        min(len(auth_numbers), max_auth_terms),
-        len(auth_numbers),
-        len(merged),
-        int((time.perf_counter() - started) * 1000),
+    table = _local_sag_table(settings)
+    if table is not None:
+        return table.rows_matching(criteria, max_points)
+    return scroll_points_by_filter(
+        client=get_qdrant_client(settings),
+        collection=settings.qdrant_sag_collection,
+        query_filter=qm.Filter(
+            should=[
+                qm.FieldCondition(key=field, match=qm.MatchAny(any=list(values)))
+                for field, values in criteria.items()
+                if values
+            ]
+        ),
+        limit_per_page=limit_per_page,
+        max_points=max_points,
+        timeout=get_qdrant_call_timeout(settings),
     )
-    return merged
 
 
 def retrieve_sag_rows_by_ids(
@@ -489,8 +541,6 @@ def retrieve_sag_rows_by_ids(
         return []
 
     started = time.perf_counter()
-    qdrant = get_qdrant_client(settings)
-    collection = settings.qdrant_sag_collection
 
     merged: List[Dict[str, Any]] = []
     seen_ids: set[str] = set()
@@ -504,43 +554,21 @@ def retrieve_sag_rows_by_ids(
         merged.append(hit)
 
     if pids:
-        pid_filters = [
-            qm.FieldCondition(key="producto_id", match=qm.MatchValue(value=pid))
-            for pid in sorted(pids)[:500]
-        ]
-        points = scroll_points_by_filter(
-            client=qdrant,
-            collection=collection,
-            query_filter=qm.Filter(should=pid_filters),
-            limit_per_page=256,
-            max_points=max_rows,
-        )
-        for p in points:
+        for p in retrieve_sag_rows_matching(settings, {"producto_id": sorted(pids)[:500]}, max_rows):
             _add(p)
 
     if auths:
-        auth_filters = [
-            qm.FieldCondition(
-                key="autorizacion_sag_numero_normalizado",
-                match=qm.MatchValue(value=auth),
-            )
-            for auth in sorted(auths)[:500]
-        ]
-        points = scroll_points_by_filter(
-            client=qdrant,
-            collection=collection,
-            query_filter=qm.Filter(should=auth_filters),
-            limit_per_page=256,
-            max_points=max_rows,
-        )
-        for p in points:
+        for p in retrieve_sag_rows_matching(
+            settings, {"autorizacion_sag_numero_normalizado": sorted(auths)[:500]}, max_rows,
+        ):
             _add(p)
 
     logger.info(
-        "📚 Qdrant SAG (ids) | product_ids=%s | auths=%s | rows=%s | tiempo=%sms",
+        "📚 Qdrant SAG (ids) | product_ids=%s | auths=%s | rows=%s | origen=%s | tiempo=%sms",
         len(pids),
         len(auths),
         len(merged),
+        "local" if _local_sag_table(settings) is not None else "qdrant",
         int((time.perf_counter() - started) * 1000),
     )
     return merged
@@ -563,6 +591,7 @@ def retrieve_sag_all_rows(
         query_filter=qm.Filter(),
         limit_per_page=256,
         max_points=max_rows,
+        timeout=get_qdrant_call_timeout(settings),
     )
     logger.info(
         "📚 Qdrant SAG (scroll global) | colección=%s | filas=%s | tiempo=%sms",
@@ -0,0 +1,293 @@
+"""
+Tabla columnar local de filas SAG (producto × cultivo × objetivo × dosis).
+
+Se arma con un scroll completo de la colección SAG y solo se vuelve a leer si
+cambia `points_count`. Cada columna es categórica y codificada por
+diccionario (códigos int32 + valores distintos): un filtro evalúa su
+predicado una vez por valor distinto y lo proyecta a filas con NumPy, así los
+filtros estructurados (ingrediente/cultivo/objetivo) no recorren payloads en
+el turno y Qdrant queda solo para el ranking semántico.
+
+La tabla también indexa `producto_id` y `autorizacion_sag_numero_normalizado`:
+las lecturas de filas por id se resuelven con diccionarios, respetando el
+orden y el corte `max_points` del scroll equivalente en Qdrant.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+from ..config import Settings
+from ..vectorstore.qdrant_client import get_qdrant_call_timeout, get_qdrant_client
+from ..vectorstore.search import scroll_points_by_filter
+
+# Máscaras memoizadas por tabla (columna, versión de columna, predicado).
+MASK_MEMO_MAX = 256
+# Campos de payload indexados para lecturas por id (MatchValue exacto).
+SAG_ID_FIELDS = ("producto_id", "autorizacion_sag_numero_normalizado")
+logger = logging.getLogger(__name__)
+
+_table_guard = threading.Lock()
+_refresh_guard = threading.Lock()
+_table: Optional["SagRegistryTable"] = None
+_sync_running = False
+_last_sync_check = 0.0
+# Columnas registradas: nombre -> (extractor de payload, clave de versión).
+_column_specs: Dict[str, tuple[Callable[[Dict[str, Any]], str], Callable[[], Hashable]]] = {}
+
+
+def _no_column_key() -> Hashable:
+    return None
+
+
+def register_sag_column(
+    name: str,
+    extractor: Callable[[Dict[str, Any]], str],
+    *,
+    key: Callable[[], Hashable] = _no_column_key,
+) -> None:
+    """
+    Declara una columna derivada del payload. Se precalcula en cada
+    sincronización y se recalcula si cambia `key()`.
+    """
+    with _table_guard:
+        _column_specs[name] = (extractor, key)
+
+
+def _match_values(value: Any) -> List[str]:
+    # MatchValue de keyword solo coincide con strings (o elementos string de listas).
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, str)]
+    return []
+
+
+@dataclass(slots=True)
+class CategoricalColumn:
+    codes: np.ndarray
+    values: List[str]
+
+    @classmethod
+    def encode(cls, raw: Iterable[str]) -> "CategoricalColumn":
+        lookup: Dict[str, int] = {}
+        codes = np.fromiter((lookup.setdefault(value, len(lookup)) for value in raw), dtype=np.int32)
+        return cls(codes=codes, values=list(lookup))
+
+    def mask(self, predicate: Callable[[str], bool]) -> np.ndarray:
+        """Máscara booleana por fila; el predicado se evalúa una vez por valor distinto."""
+        keep = np.fromiter((bool(predicate(value)) for value in self.values), dtype=bool, count=len(self.values))
+        return keep[self.codes]
+
+
+class SagRegistryTable:
+    """Filas SAG en orden de scroll con columnas categóricas derivadas bajo demanda."""
+
+    def __init__(self, collection: str, points_count: int, rows: List[Dict[str, Any]]) -> None:
+        self.collection = collection
+        self.points_count = points_count
+        self.rows = rows
+        self.built_at = time.time()
+        self._row_index = {str(row.get("id")): pos for pos, row in enumerate(rows)}
+        self._lock = threading.Lock()
+        self._columns: Dict[str, tuple[Hashable, CategoricalColumn]] = {}
+        self._masks: "OrderedDict[tuple[Hashable, ...], np.ndarray]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, np.ndarray]] = {name: self._build_postings(name) for name in SAG_ID_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def row_index(self, point_id: Any) -> Optional[int]:
+        return self._row_index.get(str(point_id))
+
+    def _build_postings(self, field: str) -> Dict[str, np.ndarray]:
+        positions: Dict[str, list[int]] = {}
+        for pos, row in enumerate(self.rows):
+            for value in _match_values((row.get("payload") or {}).get(field)):
+                positions.setdefault(value, []).append(pos)
+        return {value: np.asarray(found, dtype=np.int32) for value, found in positions.items()}
+
+    def rows_matching(self, criteria: Dict[str, Iterable[str]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Filas con algún campo de `criteria` igual a alguno de sus valores, en
+        orden de scroll y cortadas en `limit` (mismo resultado que un scroll
+        con `should` de MatchValue).
+        """
+        parts: List[np.ndarray] = []
+        for field, values in criteria.items():
+            postings = self._postings.get(field)
+            if postings is None:
+                postings = self._build_postings(field)
+                with self._lock:
+                    self._postings[field] = postings
+            parts.extend(postings[value] for value in values if value in postings)
+        if not parts or limit <= 0:
+            return []
+        positions = np.unique(np.concatenate(parts))[:limit]
+        return [self.rows[pos] for pos in positions]
+
+    def column(self, name: str) -> CategoricalColumn:
+        """Columna registrada `name` (se recalcula si cambió su clave, p.ej. versión del catálogo)."""
+        return self._column_entry(name)[1]
+
+    def _column_entry(self, name: str) -> tuple[Hashable, CategoricalColumn]:
+        spec = _column_specs.get(name)
+        if spec is None:
+            raise KeyError(f"columna SAG no registrada: {name}")
+        extractor, key_fn = spec
+        key = key_fn()
+        with self._lock:
+            cached = self._columns.get(name)
+        if cached is not None and cached[0] == key:
+            return cached
+        started = time.perf_counter()
+        column = CategoricalColumn.encode(extractor(row.get("payload") or {}) for row in self.rows)
+        with self._lock:
+            self._columns[name] = (key, column)
+        logger.info(
+            "📐 Tabla SAG | columna=%s | filas=%s | valores=%s | tiempo=%sms",
+            name,
+            len(column.codes),
+            len(column.values),
+            int((time.perf_counter() - started) * 1000),
+        )
+        return key, column
+
+    def cardinality(self, name: str) -> int:
+        """Cantidad de valores distintos de la columna (evaluaciones de predicado de `mask`)."""
+        return len(self.column(name).values)
+
+    def cached_mask(self, name: str, predicate_key: Hashable) -> Optional[np.ndarray]:
+        """Máscara ya memoizada para `predicate_key`, sin evaluar el predicado."""
+        key, _ = self._column_entry(name)
+        memo_key = (name, key, predicate_key)
+        with self._lock:
+            cached = self._masks.get(memo_key)
+            if cached is not None:
+                self._masks.move_to_end(memo_key)
+            return cached
+
+    def mask(self, name: str, predicate: Callable[[str], bool], *, predicate_key: Hashable) -> np.ndarray:
+        """Máscara de filas que cumplen `predicate` sobre la columna (memoizada por `predicate_key`)."""
+        cached = self.cached_mask(name, predicate_key)
+        if cached is not None:
+            return cached
+        key, column = self._column_entry(name)
+        memo_key = (name, key, predicate_key)
+        mask = column.mask(predicate)
+        with self._lock:
+            self._masks[memo_key] = mask
+            while len(self._masks) > MASK_MEMO_MAX:
+                self._masks.popitem(last=False)
+        return mask
+
+    def rows_where(self, mask: np.ndarray) -> List[Dict[str, Any]]:
+        return [self.rows[pos] for pos in np.flatnonzero(mask)]
+
+
+def current_sag_table() -> Optional[SagRegistryTable]:
+    """Tabla vigente, o None si aún no se sincronizó (o está desactivada)."""
+    return _table
+
+
+def refresh_sag_table(settings: Settings, *, force: bool = False) -> Optional[SagRegistryTable]:
+    """
+    Sincroniza la tabla con la colección SAG: solo hace el scroll completo si
+    cambió `points_count` (o con `force`). Las columnas registradas se
+    precalculan antes del reemplazo, que es atómico.
+    """
+    global _table, _last_sync_check
+    if not settings.sag_table_enabled:
+        return None
+    collection = settings.qdrant_sag_collection
+    with _refresh_guard:
+        qdrant = get_qdrant_client(settings)
+        points_count = int(qdrant.get_collection(collection).points_count or 0)
+        _last_sync_check = time.time()
+        current = _table
+        if (
+            not force
+            and current is not None
+            and current.collection == collection
+            and current.points_count == points_count
+        ):
+            return current
+        max_rows = max(int(settings.sag_table_max_rows), 0)
+        if points_count > max_rows:
+            logger.warning(
+                "Tabla SAG desactivada: la colección tiene %s puntos (máximo %s).",
+                points_count,
+                max_rows,
+            )
+            with _table_guard:
+                _table = None
+            return None
+
+        started = time.perf_counter()
+        rows = scroll_points_by_filter(
+            client=qdrant,
+            collection=collection,
+            query_filter=None,
+            limit_per_page=1024,
+            max_points=max_rows,
+            timeout=get_qdrant_call_timeout(settings),
+        )
+        table = SagRegistryTable(collection, points_count, rows)
+        for name in list(_column_specs):
+            table.column(name)
+        with _table_guard:
+            _table = table
+    logger.info(
+        "📐 Tabla SAG sincronizada | colección=%s | filas=%s | tiempo=%sms",
+        collection,
+        len(table),
+        int((time.perf_counter() - started) * 1000),
+    )
+    return table
+
+
+def sync_sag_table(settings: Settings) -> Optional[SagRegistryTable]:
+    """`refresh_sag_table` sin propagar errores: si falla se conserva la tabla vigente."""
+    try:
+        return refresh_sag_table(settings)
+    except Exception:
+        logger.warning("No se pudo sincronizar la tabla SAG local; se mantiene la versión anterior.", exc_info=True)
+        return _table
+
+
+def schedule_sag_table_sync(settings: Settings) -> None:
+    """
+    Revisa `points_count` en un hilo de fondo como máximo una vez por
+    `SAG_TABLE_SYNC_INTERVAL_SECONDS`; el turno no espera la sincronización.
+    """
+    global _sync_running, _last_sync_check
+    if not settings.sag_table_enabled:
+        return
+    interval = max(float(settings.sag_table_sync_interval_seconds), 0.0)
+    now = time.time()
+    with _table_guard:
+        if _sync_running or now - _last_sync_check < interval:
+            return
+        _sync_running = True
+        _last_sync_check = now
+    threading.Thread(
+        target=_sync_in_background,
+        args=(settings,),
+        name="sag-table-sync",
+        daemon=True,
+    ).start()
+
+
+def _sync_in_background(settings: Settings) -> None:
+    global _sync_running
+    try:
+        sync_sag_table(settings)
+    finally:
+        with _table_guard:
+            _sync_running = False
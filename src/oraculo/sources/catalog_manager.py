@@ -0,0 +1,235 @@
+"""
+Catálogos CSV recargables en caliente (CER.csv, SAG.csv).
+
+Cada `CatalogManager` guarda la versión vigente por ruta. Si cambia el
+mtime/tamaño del archivo (o se pide recarga explícita, p.ej. SIGHUP), el
+índice se reconstruye en un hilo de fondo y se reemplaza de forma atómica:
+los turnos en curso siguen usando la versión anterior sin bloquearse.
+
+Con `snapshot_schema`, el índice compilado se guarda junto al CSV
+(`<archivo>.index.pkl`, pickle protocolo 5) con el sha256 del CSV: un
+arranque con el mismo CSV lo carga sin re-parsear; si el hash no coincide
+se reconstruye desde el CSV y se reescribe el snapshot.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Intervalo mínimo entre chequeos de mtime/tamaño por ruta.
+CHECK_INTERVAL_SECONDS = 5.0
+SNAPSHOT_SUFFIX = ".index.pkl"
+SNAPSHOT_FORMAT = 1
+logger = logging.getLogger(__name__)
+
+_version_guard = threading.Lock()
+_version = 0
+_managers: list["CatalogManager[Any]"] = []
+
+
+def _next_version() -> int:
+    global _version
+    with _version_guard:
+        _version += 1
+        return _version
+
+
+def catalog_version() -> int:
+    """Versión global de catálogos; aumenta con cada recarga (clave para caches derivadas)."""
+    return _version
+
+
+def _file_signature(path: Path) -> Optional[tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path(path: Path) -> Path:
+    return path.with_name(path.name + SNAPSHOT_SUFFIX)
+
+
+@dataclass(slots=True)
+class _CatalogSlot(Generic[T]):
+    value: T
+    signature: Optional[tuple[int, int]]
+    version: int
+    checked_at: float
+    rebuilding: bool = False
+    reload_requested: bool = False
+
+
+class CatalogManager(Generic[T]):
+    """Índice construido desde un archivo, con recarga en background y swap atómico."""
+
+    def __init__(self, name: str, builder: Callable[[Path], T], *, snapshot_schema: int = 0) -> None:
+        self.name = name
+        self._builder = builder
+        # Versión del formato del índice; cambiarla invalida snapshots previos (0 = sin snapshot).
+        self.snapshot_schema = snapshot_schema
+        self._lock = threading.Lock()
+        self._slots: dict[str, _CatalogSlot[T]] = {}
+        with _version_guard:
+            _managers.append(self)
+
+    def get(self, path: Path) -> T:
+        """
+        Versión vigente del catálogo. La primera carga es síncrona; las
+        siguientes detectan cambios y recargan en background.
+        """
+        return self.get_versioned(path)[0]
+
+    def get_versioned(self, path: Path) -> tuple[T, int]:
+        """Como `get`, junto al número de versión del valor devuelto."""
+        slot = self._slots.get(str(path))
+        if slot is None:
+            self._load_initial(path)
+            slot = self._slots[str(path)]
+            return slot.value, slot.version
+        now = time.time()
+        if (slot.reload_requested or now - slot.checked_at >= CHECK_INTERVAL_SECONDS) and not slot.rebuilding:
+            self._maybe_schedule(path, now)
+        return slot.value, slot.version
+
+    def version(self, path: Path) -> int:
+        slot = self._slots.get(str(path))
+        return slot.version if slot is not None else 0
+
+    def request_reload(self) -> None:
+        """Marca todas las rutas para reconstrucción en el próximo acceso."""
+        with self._lock:
+            for slot in self._slots.values():
+                slot.reload_requested = True
+
+    def reload(self, path: Path) -> T:
+        """Reconstruye de forma síncrona (CLI/tests) y devuelve la nueva versión."""
+        signature = _file_signature(path)
+        value = self._build(path)
+        return self._swap(path, value, signature)
+
+    def _load_initial(self, path: Path) -> T:
+        with self._lock:
+            slot = self._slots.get(str(path))
+            if slot is not None:
+                return slot.value
+            signature = _file_signature(path)
+            value = self._build(path)
+            version = _next_version()
+            self._slots[str(path)] = _CatalogSlot(value, signature, version, time.time())
+        logger.info("📚 Catálogo %s cargado | ruta=%s | versión=%s", self.name, path, version)
+        return value
+
+    def _maybe_schedule(self, path: Path, now: float) -> None:
+        with self._lock:
+            slot = self._slots[str(path)]
+            if slot.rebuilding:
+                return
+            slot.checked_at = now
+            signature = _file_signature(path)
+            if signature == slot.signature and not slot.reload_requested:
+                return
+            slot.rebuilding = True
+            slot.reload_requested = False
+        threading.Thread(
+            target=self._rebuild,
+            args=(path, signature),
+            name=f"catalog-reload-{self.name}",
+            daemon=True,
+        ).start()
+
+    def _rebuild(self, path: Path, signature: Optional[tuple[int, int]]) -> None:
+        started = time.perf_counter()
+        try:
+            value = self._build(path)
+        except Exception:
+            logger.warning("No se pudo recargar catálogo %s (%s); se mantiene la versión anterior.", self.name, path, exc_info=True)
+            with self._lock:
+                slot = self._slots[str(path)]
+                # No reintentar el mismo archivo hasta que vuelva a cambiar.
+                slot.signature = signature
+                slot.rebuilding = False
+            return
+        self._swap(path, value, signature)
+        logger.info(
+            "♻️ Catálogo %s recargado | ruta=%s | tiempo=%sms",
+            self.name,
+            path,
+            int((time.perf_counter() - started) * 1000),
+        )
+
+    def _build(self, path: Path) -> T:
+        """Construye desde el snapshot si coincide el hash del CSV; si no, desde el CSV."""
+        if not self.snapshot_schema or not path.exists():
+            return self._builder(path)
+        header = {"format": SNAPSHOT_FORMAT, "schema": self.snapshot_schema, "sha256": _file_sha256(path)}
+        snap = snapshot_path(path)
+        started = time.perf_counter()
+        try:
+            with snap.open("rb") as fh:
+                if pickle.load(fh) == header:
+                    value = pickle.load(fh)
+                    logger.info(
+                        "📦 Catálogo %s desde snapshot | ruta=%s | tiempo=%sms",
+                        self.name,
+                        snap,
+                        int((time.perf_counter() - started) * 1000),
+                    )
+                    return value
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.warning("Snapshot de catálogo ilegible (%s); se reconstruye desde CSV.", snap, exc_info=True)
+
+        value = self._builder(path)
+        try:
+            self._write_snapshot(snap, header, value)
+        except Exception:
+            logger.warning("No se pudo escribir snapshot de catálogo %s.", snap, exc_info=True)
+        return value
+
+    @staticmethod
+    def _write_snapshot(snap: Path, header: dict[str, Any], value: Any) -> None:
+        fd, tmp_name = tempfile.mkstemp(prefix=snap.name, suffix=".tmp", dir=str(snap.parent))
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(header, fh, protocol=5)
+                pickle.dump(value, fh, protocol=5)
+            os.replace(tmp_name, snap)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _swap(self, path: Path, value: T, signature: Optional[tuple[int, int]]) -> T:
+        version = _next_version()
+        with self._lock:
+            self._slots[str(path)] = _CatalogSlot(value, signature, version, time.time())
+        return value
+
+
+def request_catalog_reload() -> None:
+    """Pide recargar todos los catálogos (p.ej. desde SIGHUP)."""
+    with _version_guard:
+        managers = list(_managers)
+    for manager in managers:
+        manager.request_reload()
+    logger.info("♻️ Recarga de catálogos solicitada | catálogos=%s", [m.name for m in managers])
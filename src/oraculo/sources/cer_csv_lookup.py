@@ -3,10 +3,14 @@ from __future__ import annotations
 import csv
 import re
 import unicodedata
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import lru_cache
 from pathlib import Path
 
+from ..turn_context import turn_memo
+from .catalog_manager import CatalogManager
+from .entity_matcher import EntityMatcher
+
 STOPWORDS = {
     "de",
     "del",
@@ -33,6 +37,9 @@ STOPWORDS = {
     "todas",
 }
 
+# Memo de tokens de consulta -> ids de registros que los contienen (substring).
+SUBSTRING_MEMO_MAX = 4096
+
 
 @dataclass(slots=True)
 class CerCsvRecord:
@@ -55,6 +62,44 @@ class CerCsvIndex:
     variedades: set[str]
     clientes: set[str]
     temporadas: set[str]
+    # Campos normalizados por registro: (temporada, cliente, producto, especie, variedad).
+    record_norms: list[tuple[str, str, str, str, str]] = field(default_factory=list)
+    record_especie_roots: list[frozenset[str]] = field(default_factory=list)
+    # Palabra ([a-z0-9]+ de searchable_text) / raíz de especie -> ids de registro.
+    word_postings: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    root_postings: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    # especie normalizada -> (tokens relevantes, raíces) para detect_cer_entities.
+    especie_profiles: dict[str, tuple[tuple[str, ...], frozenset[str]]] = field(default_factory=dict)
+    # Aho-Corasick sobre formas normalizadas de especies; payload = especie normalizada.
+    species_matcher: EntityMatcher | None = None
+    especies_by_root: dict[str, frozenset[str]] = field(default_factory=dict)
+    # Mapas de resolución (claves de `lookup_key`/`meta_key`); ante duplicados gana la última fila.
+    by_pdf: dict[str, CerCsvRecord] = field(default_factory=dict)
+    by_doc_key: dict[str, CerCsvRecord] = field(default_factory=dict)
+    by_pdf_name: dict[str, CerCsvRecord] = field(default_factory=dict)
+    by_meta: dict[tuple[str, str, str, str, str], CerCsvRecord] = field(default_factory=dict)
+    records_by_especie: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    _substring_memo: dict[str, frozenset[int]] = field(default_factory=dict)
+
+    def records_containing(self, token: str) -> frozenset[int]:
+        """
+        Ids de registros cuyo searchable_text contiene `token` como substring.
+
+        Un token alfanumérico solo puede aparecer dentro de una palabra del
+        texto, así que basta recorrer el vocabulario (no los registros).
+        """
+        ids = self._substring_memo.get(token)
+        if ids is not None:
+            return ids
+        found: set[int] = set()
+        for word, postings in self.word_postings.items():
+            if token in word:
+                found.update(postings)
+        ids = frozenset(found)
+        if len(self._substring_memo) >= SUBSTRING_MEMO_MAX:
+            self._substring_memo.clear()
+        self._substring_memo[token] = ids
+        return ids
 
 
 def _normalize(text: str) -> str:
@@ -96,19 +141,22 @@ def _token_roots(text: str) -> set[str]:
     return roots
 
 
+@lru_cache(maxsize=1024)
+def _short_needle_pattern(n: str) -> re.Pattern[str]:
+    variants = {n, _singular(n), f"{n}s", f"{n}es"}
+    return re.compile("|".join(rf"\b{re.escape(v)}\b" for v in sorted(variants) if v))
+
+
 def _contains_with_plural_support(haystack: str, needle: str) -> bool:
-    h = _normalize(haystack)
-    n = _normalize(needle)
+    return _contains_normalized(_normalize(haystack), _normalize(needle))
+
+
+def _contains_normalized(h: str, n: str) -> bool:
+    """`_contains_with_plural_support` para textos ya normalizados."""
     if not h or not n:
         return False
     if len(n) <= 3:
-        variants = {n}
-        n_s = _singular(n)
-        if n_s:
-            variants.add(n_s)
-        variants.add(f"{n}s")
-        variants.add(f"{n}es")
-        return any(re.search(rf"\b{re.escape(v)}\b", h) for v in variants if v)
+        return _short_needle_pattern(n).search(h) is not None
     if n in h:
         return True
     n_s = _singular(n)
@@ -123,14 +171,153 @@ def _contains_with_plural_support(haystack: str, needle: str) -> bool:
                 continue
             if len(token) < 3:
                 continue
-            if _contains_with_plural_support(h, token):
+            if _contains_normalized(h, token):
                 return True
     return False
 
 
-@lru_cache(maxsize=2)
+def lookup_key(text: str) -> str:
+    """Clave de búsqueda por pdf/doc_id/especie (NFKD, sin acentos, minúsculas)."""
+    value = unicodedata.normalize("NFKD", text or "")
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", value.lower().strip())
+
+
+def doc_lookup_keys(value: object) -> set[str]:
+    """Claves con las que un pdf o doc_id puede coincidir: ruta, nombre y stem."""
+    raw = str(value or "").strip()
+    if not raw:
+        return set()
+    name = Path(raw).name
+    stem = Path(name).stem
+    keys = {lookup_key(raw), lookup_key(name), lookup_key(stem)}
+    return {k for k in keys if k}
+
+
+def _meta_token(value: object) -> str:
+    text = unicodedata.normalize("NFKD", str(value or "").strip())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).upper()
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def meta_key(temporada: object, cliente: object, producto: object, especie: object, variedad: object) -> tuple[str, str, str, str, str]:
+    """Clave por metadata (solo alfanuméricos en mayúsculas) usada al resolver fuentes."""
+    return (
+        _meta_token(temporada),
+        _meta_token(cliente),
+        _meta_token(producto),
+        _meta_token(especie),
+        _meta_token(variedad),
+    )
+
+
+def _build_lookup_maps(index: CerCsvIndex) -> None:
+    especies: dict[str, list[int]] = {}
+    for rid, rec in enumerate(index.records):
+        pdf_key = lookup_key(rec.pdf)
+        if pdf_key:
+            index.by_pdf[pdf_key] = rec
+        for key in doc_lookup_keys(rec.pdf):
+            index.by_doc_key[key] = rec
+        if rec.pdf:
+            index.by_pdf_name[rec.pdf.lower()] = rec
+            index.by_meta[meta_key(rec.temporada, rec.cliente, rec.producto, rec.especie, rec.variedad)] = rec
+        especie_key = lookup_key(rec.especie)
+        if especie_key:
+            especies.setdefault(especie_key, []).append(rid)
+    index.records_by_especie = {key: tuple(ids) for key, ids in especies.items()}
+
+
+def _surface_forms(n: str) -> list[tuple[str, bool]]:
+    """
+    Formas (texto, requiere límite de palabra) que hacen verdadero
+    `_contains_normalized(h, n)` cuando aparecen en `h`.
+    """
+    if not n:
+        return []
+    if len(n) <= 3:
+        return [(v, True) for v in sorted({n, _singular(n), f"{n}s", f"{n}es"}) if v]
+    forms = [(n, False), (_singular(n), False)]
+    if " " in n:
+        for token in _tokenize(n):
+            if token in STOPWORDS or len(token) < 3:
+                continue
+            forms.extend(_surface_forms(token))
+    return forms
+
+
+def _build_species_matcher(index: CerCsvIndex) -> None:
+    matcher = EntityMatcher()
+    for especie in index.especies:
+        for form, word_boundary in _surface_forms(especie):
+            matcher.add(form, especie, word_boundary=word_boundary)
+    # Fallback por token relevante de especie (ej. "uvas" -> "uva de mesa").
+    especies_by_root: dict[str, set[str]] = {}
+    for especie_norm, (specie_tokens, especie_roots) in index.especie_profiles.items():
+        for tok in specie_tokens:
+            for form, word_boundary in _surface_forms(tok):
+                matcher.add(form, especie_norm, word_boundary=word_boundary)
+        for root in especie_roots:
+            especies_by_root.setdefault(root, set()).add(especie_norm)
+    index.species_matcher = matcher.build()
+    index.especies_by_root = {root: frozenset(values) for root, values in especies_by_root.items()}
+
+
+def _match_cer_species(index: CerCsvIndex, norm_text: str) -> set[str]:
+    """
+    Especies mencionadas en una pasada: citadas directamente, por token
+    relevante o por raíz compartida.
+    """
+    found: set[str] = set()
+    if not norm_text or index.species_matcher is None:
+        return found
+    found.update(index.species_matcher.payloads(norm_text))
+    for root in _token_roots(norm_text):
+        found.update(index.especies_by_root.get(root, ()))
+    return found
+
+
+def _build_postings(index: CerCsvIndex) -> None:
+    """Precalcula campos normalizados, raíces y listas de postings del índice."""
+    words: dict[str, list[int]] = {}
+    roots: dict[str, list[int]] = {}
+    for rid, rec in enumerate(index.records):
+        index.record_norms.append(
+            (
+                _normalize(rec.temporada),
+                _normalize(rec.cliente),
+                _normalize(rec.producto),
+                _normalize(rec.especie),
+                _normalize(rec.variedad),
+            )
+        )
+        especie_roots = frozenset(_token_roots(rec.especie)) if rec.especie else frozenset()
+        index.record_especie_roots.append(especie_roots)
+        for root in especie_roots:
+            roots.setdefault(root, []).append(rid)
+        for word in set(re.findall(r"[a-z0-9]+", rec.searchable_text)):
+            words.setdefault(word, []).append(rid)
+    index.word_postings = {word: tuple(ids) for word, ids in words.items()}
+    index.root_postings = {root: tuple(ids) for root, ids in roots.items()}
+    index.especie_profiles = {
+        especie_norm: (
+            tuple(tok for tok in _tokenize(especie_norm) if tok not in STOPWORDS and len(tok) >= 3),
+            frozenset(_token_roots(especie_norm)),
+        )
+        for especie_norm in index.especies
+    }
+
+
 def load_cer_index(csv_path: str) -> CerCsvIndex:
-    path = Path((csv_path or "").strip() or "CER.csv")
+    """Índice vigente de CER.csv (se recarga en background si cambia el archivo)."""
+    return _load_cer_index_versioned(csv_path)[0]
+
+
+def _load_cer_index_versioned(csv_path: str) -> tuple[CerCsvIndex, int]:
+    return _cer_catalog.get_versioned(Path((csv_path or "").strip() or "CER.csv").resolve())
+
+
+def _build_cer_index(path: Path) -> CerCsvIndex:
     if not path.exists():
         return CerCsvIndex([], set(), set(), set(), set(), set())
 
@@ -179,83 +366,133 @@ def load_cer_index(csv_path: str) -> CerCsvIndex:
             if rec.temporada:
                 temporadas.add(_normalize(rec.temporada))
 
-    return CerCsvIndex(records, especies, productos, variedades, clientes, temporadas)
+    index = CerCsvIndex(records, especies, productos, variedades, clientes, temporadas)
+    _build_postings(index)
+    _build_species_matcher(index)
+    _build_lookup_maps(index)
+    return index
 
 
-def find_cer_records_by_query(csv_path: str, query_text: str, limit: int = 40) -> list[CerCsvRecord]:
-    query_norm = _normalize(query_text)
-    if not query_norm:
-        return []
+# Subir CER_INDEX_SCHEMA al cambiar la estructura de CerCsvIndex (invalida snapshots).
+CER_INDEX_SCHEMA = 2
+_cer_catalog: CatalogManager[CerCsvIndex] = CatalogManager(
+    "CER.csv",
+    _build_cer_index,
+    snapshot_schema=CER_INDEX_SCHEMA,
+)
+
+
+def _rank_cer_record_ids(index: CerCsvIndex, query_norm: str, limit: int) -> list[int]:
+    """Ids de registros ordenados por score; solo evalúa candidatos de los postings."""
     query_tokens = [tok for tok in _tokenize(query_norm) if tok not in STOPWORDS]
     query_roots = _token_roots(query_norm)
-    if not query_tokens:
-        if not query_roots:
-            return []
-
-    index = load_cer_index(csv_path)
-    ranked: list[tuple[int, CerCsvRecord]] = []
+    if not query_tokens and not query_roots:
+        return []
 
-    for rec in index.records:
-        text = rec.searchable_text
-        if not text:
+    token_hits = {tok: index.records_containing(tok) for tok in set(query_tokens)}
+    candidates: set[int] = set()
+    for ids in token_hits.values():
+        candidates.update(ids)
+    for root in query_roots:
+        candidates.update(index.root_postings.get(root, ()))
+
+    # Muchos registros comparten especie/cliente/temporada: se evalúa cada valor una vez.
+    contained: dict[str, bool] = {}
+
+    def query_contains(value_norm: str) -> bool:
+        hit = contained.get(value_norm)
+        if hit is None:
+            hit = contained[value_norm] = _contains_normalized(query_norm, value_norm)
+        return hit
+
+    ranked: list[tuple[int, int]] = []
+    for rid in sorted(candidates):
+        rec = index.records[rid]
+        if not rec.searchable_text:
             continue
 
-        overlap = sum(1 for tok in query_tokens if tok in text)
+        overlap = sum(1 for tok in query_tokens if rid in token_hits[tok])
         especie_root_overlap = 0
         if rec.especie and query_roots:
-            especie_roots = _token_roots(rec.especie)
-            especie_root_overlap = len(query_roots & especie_roots)
+            especie_root_overlap = len(query_roots & index.record_especie_roots[rid])
         if overlap <= 0 and especie_root_overlap <= 0:
             continue
 
+        temporada_norm, cliente_norm, producto_norm, especie_norm, variedad_norm = index.record_norms[rid]
         score = overlap * 6
         if especie_root_overlap:
             score += min(especie_root_overlap * 10, 20)
-        if rec.especie and _contains_with_plural_support(query_norm, rec.especie):
+        if rec.especie and query_contains(especie_norm):
             score += 14
-        if rec.producto and _contains_with_plural_support(query_norm, rec.producto):
+        if rec.producto and query_contains(producto_norm):
             score += 16
-        if rec.variedad and _contains_with_plural_support(query_norm, rec.variedad):
+        if rec.variedad and query_contains(variedad_norm):
             score += 8
-        if rec.cliente and _contains_with_plural_support(query_norm, rec.cliente):
+        if rec.cliente and query_contains(cliente_norm):
             score += 6
-        if rec.temporada and _contains_with_plural_support(query_norm, rec.temporada):
+        if rec.temporada and query_contains(temporada_norm):
             score += 5
 
-        ranked.append((score, rec))
+        ranked.append((score, rid))
 
+    records = index.records
     ranked.sort(
         key=lambda item: (
             item[0],
-            item[1].temporada,
-            item[1].producto,
-            item[1].especie,
-            item[1].variedad,
+            records[item[1]].temporada,
+            records[item[1]].producto,
+            records[item[1]].especie,
+            records[item[1]].variedad,
         ),
         reverse=True,
     )
 
-    out: list[CerCsvRecord] = []
+    out: list[int] = []
     seen: set[tuple[str, str, str, str, str]] = set()
-    for _, rec in ranked:
-        key = (
-            _normalize(rec.temporada),
-            _normalize(rec.cliente),
-            _normalize(rec.producto),
-            _normalize(rec.especie),
-            _normalize(rec.variedad),
-        )
+    for _, rid in ranked:
+        key = index.record_norms[rid]
         if key in seen:
             continue
         seen.add(key)
-        out.append(rec)
+        out.append(rid)
         if len(out) >= max(1, int(limit)):
             break
 
     return out
 
 
+def _ranked_ids_for_turn(index: CerCsvIndex, version: int, query_norm: str, limit: int) -> tuple[int, ...]:
+    # El mismo texto se rankea desde hints, enhancer y detección de entidades.
+    return turn_memo(
+        "cer_ranking",
+        (version, query_norm, int(limit)),
+        lambda: tuple(_rank_cer_record_ids(index, query_norm, limit)),
+    )
+
+
+def _normalize_for_turn(text: str) -> str:
+    return turn_memo("cer_normalize", str(text or ""), lambda: _normalize(text))
+
+
+def find_cer_records_by_query(csv_path: str, query_text: str, limit: int = 40) -> list[CerCsvRecord]:
+    query_norm = _normalize_for_turn(query_text)
+    if not query_norm:
+        return []
+    index, version = _load_cer_index_versioned(csv_path)
+    return [index.records[rid] for rid in _ranked_ids_for_turn(index, version, query_norm, limit)]
+
+
 def detect_cer_entities(csv_path: str, text: str) -> dict[str, set[str]]:
+    index, version = _load_cer_index_versioned(csv_path)
+    signals = turn_memo(
+        "cer_entities",
+        (version, str(text or "")),
+        lambda: _detect_cer_entities(index, version, text),
+    )
+    return {kind: set(values) for kind, values in signals.items()}
+
+
+def _detect_cer_entities(index: CerCsvIndex, version: int, text: str) -> dict[str, set[str]]:
     signals = {
         "especies": set(),
         "productos": set(),
@@ -264,37 +501,16 @@ def detect_cer_entities(csv_path: str, text: str) -> dict[str, set[str]]:
         "temporadas": set(),
     }
 
-    norm_text = _normalize(text)
+    norm_text = _normalize_for_turn(text)
     if not norm_text:
         return signals
 
-    index = load_cer_index(csv_path)
-    query_roots = _token_roots(norm_text)
+    # Especies mencionadas (directa, por token relevante o por raíz; ej. ciruela/ciruelo).
+    # Cubre también las especies de los registros rankeados abajo.
+    signals["especies"] = _match_cer_species(index, norm_text)
 
-    # Detección por especie en texto directo (incluye variantes como ciruela/ciruelo).
-    for especie_norm in index.especies:
-        if not especie_norm:
-            continue
-        if _contains_with_plural_support(norm_text, especie_norm):
-            signals["especies"].add(especie_norm)
-            continue
-        # Fallback por token relevante de especie (ej. "uvas" -> "uva de mesa").
-        specie_tokens = [tok for tok in _tokenize(especie_norm) if tok not in STOPWORDS and len(tok) >= 3]
-        if specie_tokens and any(_contains_with_plural_support(norm_text, tok) for tok in specie_tokens):
-            signals["especies"].add(especie_norm)
-            continue
-        especie_roots = _token_roots(especie_norm)
-        if query_roots and especie_roots and (query_roots & especie_roots):
-            signals["especies"].add(especie_norm)
-
-    for rec in find_cer_records_by_query(csv_path, norm_text, limit=80):
-        if rec.especie:
-            especie_norm = _normalize(rec.especie)
-            especie_roots = _token_roots(especie_norm)
-            if _contains_with_plural_support(norm_text, especie_norm) or (
-                query_roots and especie_roots and (query_roots & especie_roots)
-            ):
-                signals["especies"].add(especie_norm)
+    for rid in _ranked_ids_for_turn(index, version, norm_text, 80):
+        rec = index.records[rid]
         if rec.producto:
             signals["productos"].add(rec.producto)
         if rec.variedad:
@@ -308,6 +524,15 @@ def detect_cer_entities(csv_path: str, text: str) -> dict[str, set[str]]:
 
 
 def build_cer_csv_hints_block(csv_path: str, query_text: str, limit: int = 12) -> str:
+    _, version = _load_cer_index_versioned(csv_path)
+    return turn_memo(
+        "cer_hints",
+        (version, str(query_text or ""), int(limit)),
+        lambda: _build_cer_csv_hints_block(csv_path, query_text, limit),
+    )
+
+
+def _build_cer_csv_hints_block(csv_path: str, query_text: str, limit: int) -> str:
     recs = find_cer_records_by_query(csv_path, query_text, limit=max(1, int(limit)))
     if not recs:
         return "- sin señales CER.csv"
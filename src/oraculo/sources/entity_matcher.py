@@ -0,0 +1,108 @@
+"""
+Detector multi-patrón (Aho-Corasick) para especies del catálogo CER.
+
+Las formas se registran ya normalizadas; `iter_mentions` recorre el texto una
+sola vez y entrega todas las menciones, incluidas las solapadas. Las formas
+con `word_boundary=True` equivalen a buscar `\\bforma\\b` con `re`.
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Hashable, Iterator
+
+
+@dataclass(slots=True, frozen=True)
+class EntityMention:
+    start: int
+    end: int
+    form: str
+    payload: Hashable
+
+
+def _is_word_char(ch: str) -> bool:
+    # Misma definición que `\w` en patrones str de `re`.
+    return ch.isalnum() or ch == "_"
+
+
+def _at_word_boundary(text: str, pos: int) -> bool:
+    left = pos > 0 and _is_word_char(text[pos - 1])
+    right = pos < len(text) and _is_word_char(text[pos])
+    return left != right
+
+
+class EntityMatcher:
+    """Autómata Aho-Corasick sobre formas superficiales con payload asociado."""
+
+    def __init__(self) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        self._patterns: list[tuple[str, bool, Hashable]] = []
+        self._seen: set[tuple[str, bool, Hashable]] = set()
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add(self, form: str, payload: Hashable, *, word_boundary: bool = False) -> None:
+        if not form:
+            return
+        key = (form, word_boundary, payload)
+        if key in self._seen:
+            return
+        self._seen.add(key)
+        state = 0
+        for ch in form:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(len(self._patterns))
+        self._patterns.append(key)
+        self._built = False
+
+    def build(self) -> "EntityMatcher":
+        """Calcula enlaces de falla (BFS) y propaga salidas."""
+        queue: deque[int] = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter_mentions(self, text: str) -> Iterator[EntityMention]:
+        if not self._built:
+            self.build()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in out[state]:
+                form, word_boundary, payload = patterns[pattern_id]
+                end = pos + 1
+                start = end - len(form)
+                if word_boundary and not (_at_word_boundary(text, start) and _at_word_boundary(text, end)):
+                    continue
+                yield EntityMention(start=start, end=end, form=form, payload=payload)
+
+    def payloads(self, text: str) -> set[Hashable]:
+        """Payloads con al menos una mención en el texto."""
+        return {mention.payload for mention in self.iter_mentions(text)}
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import csv
-import unicodedata
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Optional, Tuple, List, Any
+from typing import Dict, Optional, List, Any
+
+from .cer_csv_lookup import CerCsvRecord, load_cer_index, meta_key
 
 
 def _project_root() -> Path:
@@ -12,117 +11,52 @@ def _project_root() -> Path:
     return Path(__file__).resolve().parents[3]
 
 
-def _norm_token(s: Optional[str]) -> str:
-    if not s:
-        return ""
-    s = str(s).strip()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = s.upper()
-    # dejar solo alfanumérico
-    s = "".join(ch for ch in s if ch.isalnum())
-    return s
-
-
 def _humanize(s: Optional[str]) -> str:
     if not s:
         return ""
     return str(s).replace("_", " ").strip()
 
 
-@dataclass(frozen=True)
-class SourceRecord:
-    pdf: str
-    url_pdf: str
-    url_estudio: str
-    temporada: str
-    cliente: str
-    producto: str
-    especie: str
-    variedad: str
-
-    def label(self) -> str:
-        # evita underscores del filename, mejor para Telegram
-        parts = [self.temporada, self.cliente, self.producto, f"{self.especie} {self.variedad}".strip()]
-        return " | ".join([p for p in parts if p])
-
-
-class SourceResolver:
-    def __init__(self, csv_path: Optional[str] = None) -> None:
-        if csv_path:
-            self.csv_path = Path(csv_path)
-        else:
-            self.csv_path = _project_root() / "CER.csv"
-        self._loaded = False
-        self._by_pdf: Dict[str, SourceRecord] = {}
-        self._by_meta: Dict[Tuple[str, str, str, str, str], SourceRecord] = {}
-
-    def _load(self) -> None:
-        if self._loaded:
-            return
-        if not self.csv_path.exists():
-            raise FileNotFoundError(
-                f"No encontré CSV de fuentes CER en {self.csv_path}. "
-                f"Colócalo en la raíz del proyecto (CER.csv) o pasa csv_path."
-            )
-
-        with self.csv_path.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                pdf = (row.get("pdf") or "").strip()
-                if not pdf:
-                    continue
-
-                rec = SourceRecord(
-                    pdf=pdf,
-                    url_pdf=(row.get("url_pdf") or "").strip(),
-                    url_estudio=(row.get("url_estudio") or "").strip(),
-                    temporada=(row.get("temporada") or "").strip(),
-                    cliente=(row.get("cliente") or "").strip(),
-                    producto=(row.get("producto") or "").strip(),
-                    especie=(row.get("especie") or "").strip(),
-                    variedad=(row.get("variedad") or "").strip(),
-                )
-
-                self._by_pdf[pdf.strip().lower()] = rec
-
-                meta_key = (
-                    _norm_token(rec.temporada),
-                    _norm_token(rec.cliente),
-                    _norm_token(rec.producto),
-                    _norm_token(rec.especie),
-                    _norm_token(rec.variedad),
-                )
-                self._by_meta[meta_key] = rec
-
-        self._loaded = True
-
-    def resolve(self, payload: Dict[str, Any]) -> Optional[SourceRecord]:
-        self._load()
+class SourceResolver:
+    """Resuelve la fuente (links) de un payload contra el catálogo CER vigente."""
+
+    def __init__(self, csv_path: Optional[str] = None) -> None:
+        if csv_path:
+            self.csv_path = Path(csv_path)
+        else:
+            self.csv_path = _project_root() / "CER.csv"
+
+    def resolve(self, payload: Dict[str, Any]) -> Optional[CerCsvRecord]:
+        if not self.csv_path.exists():
+            raise FileNotFoundError(
+                f"No encontré CSV de fuentes CER en {self.csv_path}. "
+                f"Colócalo en la raíz del proyecto (CER.csv) o pasa csv_path."
+            )
+        index = load_cer_index(str(self.csv_path))
 
         pdf_filename = (payload.get("pdf_filename") or payload.get("pdf") or "").strip()
         if pdf_filename:
-            rec = self._by_pdf.get(pdf_filename.lower())
+            rec = index.by_pdf_name.get(pdf_filename.lower())
             if rec:
                 return rec
 
         # fallback por metadata (muy robusto si el filename “raro” no coincide)
-        meta_key = (
-            _norm_token(payload.get("temporada")),
-            _norm_token(payload.get("cliente")),
-            _norm_token(payload.get("producto")),
-            _norm_token(payload.get("especie")),
-            _norm_token(payload.get("variedad")),
+        key = meta_key(
+            payload.get("temporada"),
+            payload.get("cliente"),
+            payload.get("producto"),
+            payload.get("especie"),
+            payload.get("variedad"),
         )
-        if all(meta_key):
-            rec = self._by_meta.get(meta_key)
+        if all(key):
+            rec = index.by_meta.get(key)
             if rec:
                 return rec
 
         return None
 
 
-# Singleton simple (carga una sola vez)
+# Singleton simple: no guarda datos, consulta siempre la versión vigente del catálogo.
 _RESOLVER: Optional[SourceResolver] = None
 
 
@@ -4,10 +4,14 @@ import csv
 import os
 import re
 import unicodedata
-from dataclasses import dataclass
-from functools import lru_cache
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from ..turn_context import turn_memo
+from .catalog_manager import CatalogManager
+
 MATCH_STOPWORDS = {
     "para",
     "con",
@@ -32,6 +36,10 @@ MATCH_STOPWORDS = {
     "sag",
 }
 
+NGRAM_SIZE = 3
+# Memo de tokens de consulta -> ids de registros que los contienen (substring).
+TOKEN_MEMO_MAX = 4096
+
 
 def _normalize_text(text: str) -> str:
     text = str(text or "").strip().lower()
@@ -71,6 +79,66 @@ def _truncate(text: str, max_len: int = 180) -> str:
     return value[: max(0, max_len - 3)].rstrip() + "..."
 
 
+def _ngrams(text: str) -> set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+@dataclass(slots=True)
+class _NgramIndex:
+    """
+    Índice de trigramas sobre una lista de textos normalizados.
+
+    Responde `needle in text` (candidatos por intersección de trigramas y
+    verificación exacta) y `text in haystack` (solo textos no más largos que
+    `haystack`, vía buckets por largo).
+    """
+
+    texts: list[str]
+    postings: dict[str, array]
+    lengths: list[int]
+    by_length: list[int]
+
+    def containing(self, needle: str) -> set[int]:
+        if not needle:
+            return set(range(len(self.texts)))
+        if len(needle) < NGRAM_SIZE:
+            return {i for i, text in enumerate(self.texts) if needle in text}
+        lists = []
+        for gram in _ngrams(needle):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            candidates.intersection_update(ids)
+            if not candidates:
+                return set()
+        return {i for i in candidates if needle in self.texts[i]}
+
+    def contained_in(self, haystack: str) -> set[int]:
+        upto = bisect_right(self.lengths, len(haystack))
+        return {i for i in self.by_length[:upto] if self.texts[i] in haystack}
+
+
+def _build_ngram_index(texts: list[str]) -> _NgramIndex:
+    grams: dict[str, array] = {}
+    for i, text in enumerate(texts):
+        for gram in _ngrams(text):
+            ids = grams.get(gram)
+            if ids is None:
+                ids = grams[gram] = array("I")
+            ids.append(i)
+    by_length = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return _NgramIndex(
+        texts=texts,
+        postings=grams,
+        lengths=[len(texts[i]) for i in by_length],
+        by_length=by_length,
+    )
+
+
 @dataclass(slots=True)
 class SagCsvRecord:
     product_id: str
@@ -90,17 +158,74 @@ class SagCsvIndex:
     product_composition: dict[str, str]
     product_name: dict[str, str]
     records: list[SagCsvRecord]
+    # Nombre y composición normalizados por registro (mismo orden que `records`).
+    record_name_norms: list[str] = field(default_factory=list)
+    record_composition_norms: list[str] = field(default_factory=list)
+    # Palabra de searchable_text -> ids de registro; trigramas sobre ese vocabulario.
+    word_postings: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    vocabulary: _NgramIndex | None = None
+    # Trigramas sobre product_text / product_objective_text (no vacíos).
+    text_pids: list[str] = field(default_factory=list)
+    text_index: _NgramIndex | None = None
+    objective_pids: list[str] = field(default_factory=list)
+    objective_index: _NgramIndex | None = None
+    _token_memo: dict[str, frozenset[int]] = field(default_factory=dict)
+
+    def records_containing(self, token: str) -> frozenset[int]:
+        """Ids de registros cuyo searchable_text contiene el token alfanumérico."""
+        ids = self._token_memo.get(token)
+        if ids is not None:
+            return ids
+        found: set[int] = set()
+        if self.vocabulary is not None:
+            for word_id in self.vocabulary.containing(token):
+                found.update(self.word_postings[self.vocabulary.texts[word_id]])
+        ids = frozenset(found)
+        if len(self._token_memo) >= TOKEN_MEMO_MAX:
+            self._token_memo.clear()
+        self._token_memo[token] = ids
+        return ids
+
+
+def _build_postings(idx: SagCsvIndex) -> None:
+    """Precalcula campos normalizados, postings por palabra e índices de trigramas."""
+    words: dict[str, list[int]] = {}
+    for rid, rec in enumerate(idx.records):
+        idx.record_name_norms.append(_normalize_text(rec.product_name))
+        idx.record_composition_norms.append(_normalize_text(rec.composition))
+        for word in set(re.findall(r"[a-z0-9]+", rec.searchable_text)):
+            words.setdefault(word, []).append(rid)
+    idx.word_postings = {word: tuple(ids) for word, ids in words.items()}
+    idx.vocabulary = _build_ngram_index(list(idx.word_postings))
+
+    idx.text_pids = [pid for pid, text in idx.product_text.items() if text]
+    idx.text_index = _build_ngram_index([idx.product_text[pid] for pid in idx.text_pids])
+    idx.objective_pids = [pid for pid, text in idx.product_objective_text.items() if text]
+    idx.objective_index = _build_ngram_index(
+        [idx.product_objective_text[pid] for pid in idx.objective_pids]
+    )
 
 
-@lru_cache(maxsize=2)
 def _load_index(csv_path: str) -> SagCsvIndex:
+    """Índice vigente de SAG.csv (se recarga en background si cambia el archivo)."""
+    return _load_index_versioned(csv_path)[0]
+
+
+def load_sag_index(csv_path: str) -> SagCsvIndex:
+    return _load_index(csv_path)
+
+
+def _load_index_versioned(csv_path: str) -> tuple[SagCsvIndex, int]:
     effective_path = (
         (csv_path or "").strip()
         or os.getenv("SAG_CSV_PATH")
         or os.getenv("SAG_EXCEL_PATH")
         or "SAG.csv"
     )
-    path = Path(effective_path)
+    return _sag_catalog.get_versioned(Path(effective_path))
+
+
+def _build_index(path: Path) -> SagCsvIndex:
     if not path.exists():
         return SagCsvIndex({}, {}, {}, {}, {}, [])
 
@@ -182,7 +307,7 @@ def _load_index(csv_path: str) -> SagCsvIndex:
                 )
             )
 
-    return SagCsvIndex(
+    idx = SagCsvIndex(
         product_text=product_text,
         product_objective_text=product_objective_text,
         product_auths=product_auths,
@@ -190,48 +315,71 @@ def _load_index(csv_path: str) -> SagCsvIndex:
         product_name=product_name,
         records=records,
     )
+    _build_postings(idx)
+    return idx
+
+
+# Subir SAG_INDEX_SCHEMA al cambiar la estructura de SagCsvIndex (invalida snapshots).
+SAG_INDEX_SCHEMA = 2
+_sag_catalog: CatalogManager[SagCsvIndex] = CatalogManager(
+    "SAG.csv",
+    _build_index,
+    snapshot_schema=SAG_INDEX_SCHEMA,
+)
+
+
+def _match_products(
+    idx: SagCsvIndex,
+    text_index: _NgramIndex | None,
+    pids: list[str],
+    needle: str,
+) -> tuple[set[str], set[str]]:
+    """Productos cuyo texto contiene al needle, está contenido en él o incluye todos sus tokens."""
+    if text_index is None:
+        return set(), set()
+    matched = text_index.containing(needle) | text_index.contained_in(needle)
+    needle_tokens = _tokens(needle)
+    if needle_tokens:
+        by_tokens = text_index.containing(needle_tokens[0])
+        for tok in needle_tokens[1:]:
+            if not by_tokens:
+                break
+            by_tokens &= text_index.containing(tok)
+        matched |= by_tokens
+
+    product_ids: set[str] = set()
+    auths: set[str] = set()
+    for i in matched:
+        pid = pids[i]
+        product_ids.add(pid)
+        auths.update(idx.product_auths.get(pid, set()))
+    return product_ids, auths
 
 
 def find_products_by_ingredient(csv_path: str, ingredient_hint: str) -> tuple[set[str], set[str]]:
     needle = _normalize_text(ingredient_hint)
     if not needle:
         return set(), set()
-    needle_tokens = _tokens(needle)
-    idx = _load_index(csv_path)
-    product_ids: set[str] = set()
-    auths: set[str] = set()
-    for pid, text in idx.product_text.items():
-        if not text:
-            continue
-        if needle in text or text in needle:
-            product_ids.add(pid)
-            auths.update(idx.product_auths.get(pid, set()))
-            continue
-        if needle_tokens and all(tok in text for tok in needle_tokens):
-            product_ids.add(pid)
-            auths.update(idx.product_auths.get(pid, set()))
-    return product_ids, auths
+    idx, version = _load_index_versioned(csv_path)
+    product_ids, auths = turn_memo(
+        "sag_ingredient",
+        (version, needle),
+        lambda: _match_products(idx, idx.text_index, idx.text_pids, needle),
+    )
+    return set(product_ids), set(auths)
 
 
 def find_products_by_objective(csv_path: str, objective_hint: str) -> tuple[set[str], set[str]]:
     needle = _normalize_text(objective_hint)
     if not needle:
         return set(), set()
-    needle_tokens = _tokens(needle)
-    idx = _load_index(csv_path)
-    product_ids: set[str] = set()
-    auths: set[str] = set()
-    for pid, text in idx.product_objective_text.items():
-        if not text:
-            continue
-        if needle in text or text in needle:
-            product_ids.add(pid)
-            auths.update(idx.product_auths.get(pid, set()))
-            continue
-        if needle_tokens and all(tok in text for tok in needle_tokens):
-            product_ids.add(pid)
-            auths.update(idx.product_auths.get(pid, set()))
-    return product_ids, auths
+    idx, version = _load_index_versioned(csv_path)
+    product_ids, auths = turn_memo(
+        "sag_objective",
+        (version, needle),
+        lambda: _match_products(idx, idx.objective_index, idx.objective_pids, needle),
+    )
+    return set(product_ids), set(auths)
 
 
 def get_product_composition(csv_path: str, product_id: str) -> str:
@@ -242,7 +390,43 @@ def get_product_composition(csv_path: str, product_id: str) -> str:
     return str(idx.product_composition.get(pid, "")).strip()
 
 
+def _rank_records(
+    idx: SagCsvIndex,
+    query: str,
+    query_tokens: list[str],
+    composition_bonus: int,
+) -> list[tuple[int, SagCsvRecord]]:
+    """Registros con al menos un token de la consulta, ordenados por score (solo candidatos)."""
+    token_hits = {tok: idx.records_containing(tok) for tok in set(query_tokens)}
+    candidates: set[int] = set()
+    for ids in token_hits.values():
+        candidates.update(ids)
+
+    ranked: list[tuple[int, SagCsvRecord]] = []
+    for rid in sorted(candidates):
+        rec = idx.records[rid]
+        overlap = sum(1 for tok in query_tokens if rid in token_hits[tok])
+        score = overlap * 10
+        if rec.product_name and idx.record_name_norms[rid] in query:
+            score += 8
+        if rec.composition and any(tok in idx.record_composition_norms[rid] for tok in query_tokens):
+            score += composition_bonus
+        ranked.append((score, rec))
+
+    ranked.sort(key=lambda pair: (pair[0], pair[1].product_name), reverse=True)
+    return ranked
+
+
 def build_csv_query_hints_block(csv_path: str, query_text: str, limit: int = 8) -> str:
+    _, version = _load_index_versioned(csv_path)
+    return turn_memo(
+        "sag_hints",
+        (version, str(query_text or ""), int(limit)),
+        lambda: _build_csv_query_hints_block(csv_path, query_text, limit),
+    )
+
+
+def _build_csv_query_hints_block(csv_path: str, query_text: str, limit: int) -> str:
     query = _normalize_text(query_text)
     if not query:
         return "- sin señales adicionales desde CSV"
@@ -250,25 +434,10 @@ def build_csv_query_hints_block(csv_path: str, query_text: str, limit: int = 8)
     if not query_tokens:
         return "- sin señales adicionales desde CSV"
 
-    idx = _load_index(csv_path)
-    ranked: list[tuple[int, SagCsvRecord]] = []
-    for rec in idx.records:
-        if not rec.searchable_text:
-            continue
-        overlap = sum(1 for tok in query_tokens if tok in rec.searchable_text)
-        if overlap <= 0:
-            continue
-        score = overlap * 10
-        if rec.product_name and _normalize_text(rec.product_name) in query:
-            score += 8
-        if rec.composition and any(tok in _normalize_text(rec.composition) for tok in query_tokens):
-            score += 3
-        ranked.append((score, rec))
-
+    ranked = _rank_records(_load_index(csv_path), query, query_tokens, composition_bonus=3)
     if not ranked:
         return "- sin señales adicionales desde CSV"
 
-    ranked.sort(key=lambda pair: (pair[0], pair[1].product_name), reverse=True)
     lines: list[str] = []
     for i, (_, rec) in enumerate(ranked[: max(1, int(limit))], start=1):
         auth = _truncate(", ".join(sorted(a for a in rec.auths if a)) or "N/D", max_len=80)
@@ -285,6 +454,20 @@ def find_products_by_query(
     csv_path: str,
     query_text: str,
     limit: int = 80,
+) -> tuple[set[str], set[str], list[SagCsvRecord]]:
+    _, version = _load_index_versioned(csv_path)
+    product_ids, auths, records = turn_memo(
+        "sag_query",
+        (version, str(query_text or ""), int(limit)),
+        lambda: _find_products_by_query(csv_path, query_text, limit),
+    )
+    return set(product_ids), set(auths), list(records)
+
+
+def _find_products_by_query(
+    csv_path: str,
+    query_text: str,
+    limit: int,
 ) -> tuple[set[str], set[str], list[SagCsvRecord]]:
     query = _normalize_text(query_text)
     if not query:
@@ -294,25 +477,10 @@ def find_products_by_query(
     if not query_tokens:
         return set(), set(), []
 
-    idx = _load_index(csv_path)
-    ranked: list[tuple[int, SagCsvRecord]] = []
-    for rec in idx.records:
-        if not rec.searchable_text:
-            continue
-        overlap = sum(1 for tok in query_tokens if tok in rec.searchable_text)
-        if overlap <= 0:
-            continue
-        score = overlap * 10
-        if rec.product_name and _normalize_text(rec.product_name) in query:
-            score += 8
-        if rec.composition and any(tok in _normalize_text(rec.composition) for tok in query_tokens):
-            score += 4
-        ranked.append((score, rec))
-
+    ranked = _rank_records(_load_index(csv_path), query, query_tokens, composition_bonus=4)
     if not ranked:
         return set(), set(), []
 
-    ranked.sort(key=lambda pair: (pair[0], pair[1].product_name), reverse=True)
     top_records = [rec for _, rec in ranked[: max(1, int(limit))]]
 
     product_ids: set[str] = {rec.product_id for rec in top_records if rec.product_id}
@@ -6,6 +6,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import signal
 from concurrent.futures import ThreadPoolExecutor
 
 from telegram import Update
@@ -17,11 +18,23 @@ from telegram.ext import (
 )
 
 from ..config import Settings
+from ..providers.embedding_cache import close_embedding_cache
+from ..providers.genai_clients import close_genai_clients
+from ..rag.sag_table import sync_sag_table
+from ..sources.catalog_manager import request_catalog_reload
+from ..sources.cer_csv_lookup import load_cer_index
+from ..sources.sag_csv_lookup import load_sag_index
+from ..vectorstore.qdrant_client import close_qdrant_clients
+from ..vectorstore.payload_indexes import verify_payload_indexes
+from ..vectorstore.vector_adapter import warm_collection_dims
 from . import handlers
 from .messages import get_generic_error_message
 
 logger = logging.getLogger(__name__)
 
+# Espera máxima al armado de la tabla SAG antes de cerrar los clientes Qdrant.
+SAG_TABLE_SHUTDOWN_TIMEOUT_SECONDS = 10.0
+
 
 class TelegramBot:
     """
@@ -36,6 +49,7 @@ class TelegramBot:
         self.application: Application | None = None
         self._worker_executor: ThreadPoolExecutor | None = None
         self._cleanup_task: asyncio.Task | None = None
+        self._sag_table_task: asyncio.Task | None = None
 
     def setup(self) -> Application:
         """
@@ -85,7 +99,21 @@ class TelegramBot:
             max_workers,
             max(int(self.settings.telegram_concurrent_updates), 1),
         )
+        await asyncio.to_thread(warm_collection_dims, self.settings)
+        # Solo lectura: avisa si algún campo filtrado no tiene índice de payload.
+        await asyncio.to_thread(verify_payload_indexes, self.settings)
+        # Carga anticipada de CER.csv/SAG.csv (desde snapshot si el CSV no cambió),
+        # para que el primer turno no pague el armado de índices.
+        await asyncio.to_thread(load_cer_index, self.settings.cer_csv_path)
+        await asyncio.to_thread(load_sag_index, self.settings.sag_csv_path)
+        try:
+            # `kill -HUP <pid>` recarga CER.csv/SAG.csv sin reiniciar (y sin perder sesiones).
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, request_catalog_reload)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            logger.info("SIGHUP no disponible; la recarga de catálogos queda solo por mtime.")
         self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+        # La tabla SAG local (scroll completo) se arma sin bloquear el arranque.
+        self._sag_table_task = asyncio.create_task(asyncio.to_thread(sync_sag_table, self.settings))
 
     async def _post_shutdown(self, application: Application) -> None:
         if self._cleanup_task:
@@ -95,9 +123,23 @@ class TelegramBot:
             except asyncio.CancelledError:
                 pass
             self._cleanup_task = None
+        if self._sag_table_task:
+            try:
+                await asyncio.wait_for(self._sag_table_task, timeout=SAG_TABLE_SHUTDOWN_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "⚠️ La tabla SAG no terminó en %ss; se cierra igual.",
+                    SAG_TABLE_SHUTDOWN_TIMEOUT_SECONDS,
+                )
+            except Exception:
+                logger.warning("⚠️ Falló el armado de la tabla SAG.", exc_info=True)
+            self._sag_table_task = None
         if self._worker_executor:
             self._worker_executor.shutdown(wait=False, cancel_futures=True)
             self._worker_executor = None
+        close_qdrant_clients()
+        close_genai_clients()
+        close_embedding_cache()
 
     async def _cleanup_loop(self) -> None:
         interval = max(int(self.settings.oraculo_session_cleanup_interval_seconds), 1)
@@ -0,0 +1,89 @@
+"""
+Contexto por turno (request-scoped) para memoizar trabajo repetido.
+
+Un mismo turno vuelve a normalizar y cruzar el texto contra CER.csv/SAG.csv
+desde el router, el enhancer, el retriever y los armadores de respuesta.
+`turn_context()` abre un contexto en un ContextVar (se propaga a hilos vía
+`asyncio.to_thread`/`contextvars.copy_context`) y `turn_memo` reutiliza los
+resultados dentro del turno. Sin contexto activo, calcula siempre.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class TurnContext:
+    started_at: float = field(default_factory=time.perf_counter)
+    _values: Dict[tuple[str, Hashable], Any] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    hits: Counter = field(default_factory=Counter)
+    misses: Counter = field(default_factory=Counter)
+
+    def get(self, namespace: str, key: Hashable) -> Any:
+        """Valor memoizado o `None` (cuenta hit/miss)."""
+        with self._lock:
+            value = self._values.get((namespace, key), _MISSING)
+            if value is _MISSING:
+                self.misses[namespace] += 1
+                return None
+            self.hits[namespace] += 1
+            return value
+
+    def put(self, namespace: str, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._values[(namespace, key)] = value
+
+    def memo(self, namespace: str, key: Hashable, compute: Callable[[], T]) -> T:
+        value = self.get(namespace, key)
+        if value is None:
+            value = compute()
+            self.put(namespace, key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "evitados": sum(self.hits.values()),
+                "calculados": sum(self.misses.values()),
+                "por_tipo": dict(self.hits),
+            }
+
+
+_TURN_CONTEXT: ContextVar[Optional[TurnContext]] = ContextVar("oraculo_turn_context", default=None)
+
+
+def current_turn_context() -> Optional[TurnContext]:
+    return _TURN_CONTEXT.get()
+
+
+@contextmanager
+def turn_context() -> Iterator[TurnContext]:
+    """Abre un contexto de turno (o reutiliza el ya activo en llamadas anidadas)."""
+    active = _TURN_CONTEXT.get()
+    if active is not None:
+        yield active
+        return
+    ctx = TurnContext()
+    token = _TURN_CONTEXT.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _TURN_CONTEXT.reset(token)
+
+
+def turn_memo(namespace: str, key: Hashable, compute: Callable[[], T]) -> T:
+    """Memoiza `compute()` dentro del turno activo; sin turno, calcula directamente."""
+    ctx = _TURN_CONTEXT.get()
+    if ctx is None:
+        return compute()
+    return ctx.memo(namespace, key, compute)
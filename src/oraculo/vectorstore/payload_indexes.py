@@ -0,0 +1,196 @@
+"""
+Índices de payload requeridos por los filtros de CER y SAG.
+
+Los scrolls por `doc_id`/`chunk_index`, el filtro por metadata CER y las
+lecturas SAG por `producto_id`/autorización dependen de índices de payload
+en Qdrant (en Qdrant Cloud, sin índice el filtro recorre toda la colección o
+es rechazado en modo estricto). `verify_payload_indexes` solo revisa y avisa
+(arranque del bot); `ensure_payload_indexes` crea los que faltan, espera a
+que la colección termine de indexar y mide cada filtro antes y después.
+Los `*_norm` los crea la migración de `payload_norm`.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client import models as qm
+
+from ..config import Settings
+from .qdrant_client import get_qdrant_call_timeout, get_qdrant_client
+
+INDEXING_WAIT_SECONDS = 300.0
+INDEXING_POLL_SECONDS = 2.0
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class PayloadIndexSpec:
+    field: str
+    schema: qm.PayloadSchemaType
+
+
+CER_PAYLOAD_INDEXES = (
+    PayloadIndexSpec("doc_id", qm.PayloadSchemaType.KEYWORD),
+    PayloadIndexSpec("chunk_index", qm.PayloadSchemaType.INTEGER),
+    PayloadIndexSpec("especie", qm.PayloadSchemaType.KEYWORD),
+    PayloadIndexSpec("producto", qm.PayloadSchemaType.KEYWORD),
+    PayloadIndexSpec("variedad", qm.PayloadSchemaType.KEYWORD),
+    PayloadIndexSpec("cliente", qm.PayloadSchemaType.KEYWORD),
+    PayloadIndexSpec("pdf_filename", qm.PayloadSchemaType.KEYWORD),
+)
+SAG_PAYLOAD_INDEXES = (
+    PayloadIndexSpec("producto_id", qm.PayloadSchemaType.KEYWORD),
+    PayloadIndexSpec("autorizacion_sag_numero_normalizado", qm.PayloadSchemaType.KEYWORD),
+)
+
+
+def required_payload_indexes(settings: Settings) -> Dict[str, tuple[PayloadIndexSpec, ...]]:
+    return {
+        settings.qdrant_collection: CER_PAYLOAD_INDEXES,
+        settings.qdrant_sag_collection: SAG_PAYLOAD_INDEXES,
+    }
+
+
+def _schema_type(info: Any) -> str:
+    data_type = getattr(info, "data_type", None)
+    return str(getattr(data_type, "value", data_type) or "")
+
+
+def _missing_indexes(client: QdrantClient, collection: str, specs: tuple[PayloadIndexSpec, ...]) -> List[PayloadIndexSpec]:
+    schema = client.get_collection(collection).payload_schema or {}
+    missing: List[PayloadIndexSpec] = []
+    for spec in specs:
+        current = schema.get(spec.field)
+        if current is None:
+            missing.append(spec)
+        elif _schema_type(current) != spec.schema.value:
+            logger.warning(
+                "Índice de payload con tipo distinto | colección=%s | campo=%s | actual=%s | esperado=%s",
+                collection,
+                spec.field,
+                _schema_type(current),
+                spec.schema.value,
+            )
+    return missing
+
+
+def verify_payload_indexes(settings: Settings) -> Dict[str, List[str]]:
+    """Solo lectura: avisa por cada campo filtrado sin índice. Devuelve colección -> campos faltantes."""
+    client = get_qdrant_client(settings, allow_replica=False)
+    report: Dict[str, List[str]] = {}
+    for collection, specs in required_payload_indexes(settings).items():
+        try:
+            missing = _missing_indexes(client, collection, specs)
+        except Exception:
+            logger.warning("No se pudo revisar índices de payload de %s.", collection, exc_info=True)
+            continue
+        report[collection] = [spec.field for spec in missing]
+        for spec in missing:
+            logger.warning(
+                "⚠️ Campo filtrado sin índice de payload | colección=%s | campo=%s | tipo=%s "
+                "(python scripts/ensure_payload_indexes.py)",
+                collection,
+                spec.field,
+                spec.schema.value,
+            )
+        if not missing:
+            logger.info("🗂️ Índices de payload OK | colección=%s | campos=%s", collection, len(specs))
+    return report
+
+
+def _sample_value(client: QdrantClient, collection: str, field: str, timeout: Optional[int]) -> Any:
+    points, _ = client.scroll(
+        collection_name=collection,
+        scroll_filter=qm.Filter(must_not=[qm.IsEmptyCondition(is_empty=qm.PayloadField(key=field))]),
+        limit=1,
+        with_payload=[field],
+        with_vectors=False,
+        timeout=timeout,
+    )
+    if not points:
+        return None
+    value = (points[0].payload or {}).get(field)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
+def _probe_filters(
+    client: QdrantClient,
+    collection: str,
+    specs: tuple[PayloadIndexSpec, ...],
+    timeout: Optional[int],
+) -> Dict[str, Optional[float]]:
+    """Tiempo (ms) de un `count` exacto filtrando por un valor real de cada campo."""
+    timings: Dict[str, Optional[float]] = {}
+    for spec in specs:
+        try:
+            value = _sample_value(client, collection, spec.field, timeout)
+            if value is None:
+                timings[spec.field] = None
+                continue
+            started = time.perf_counter()
+            client.count(
+                collection_name=collection,
+                count_filter=qm.Filter(must=[qm.FieldCondition(key=spec.field, match=qm.MatchValue(value=value))]),
+                exact=True,
+                timeout=timeout,
+            )
+            timings[spec.field] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception:
+            logger.warning("No se pudo medir filtro %s.%s.", collection, spec.field, exc_info=True)
+            timings[spec.field] = None
+    return timings
+
+
+def _wait_for_indexing(client: QdrantClient, collection: str) -> bool:
+    deadline = time.monotonic() + INDEXING_WAIT_SECONDS
+    while True:
+        status = client.get_collection(collection).status
+        if status == qm.CollectionStatus.GREEN:
+            return True
+        if time.monotonic() >= deadline:
+            logger.warning("La colección %s sigue indexando (estado=%s); se continúa.", collection, status)
+            return False
+        time.sleep(INDEXING_POLL_SECONDS)
+
+
+def ensure_payload_indexes(settings: Settings, *, measure: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Crea los índices de payload faltantes en ambas colecciones, espera a que
+    terminen de indexar y reporta el tiempo de cada filtro antes/después.
+    """
+    client = get_qdrant_client(settings, allow_replica=False)
+    timeout = get_qdrant_call_timeout(settings)
+    report: Dict[str, Dict[str, Any]] = {}
+    for collection, specs in required_payload_indexes(settings).items():
+        started = time.perf_counter()
+        before = _probe_filters(client, collection, specs, timeout) if measure else {}
+        missing = _missing_indexes(client, collection, specs)
+        for spec in missing:
+            client.create_payload_index(
+                collection_name=collection,
+                field_name=spec.field,
+                field_schema=spec.schema,
+                wait=True,
+            )
+            logger.info("🗂️ Índice de payload creado | colección=%s | campo=%s | tipo=%s", collection, spec.field, spec.schema.value)
+        indexed = _wait_for_indexing(client, collection) if missing else True
+        after = _probe_filters(client, collection, specs, timeout) if measure and missing else before
+        report[collection] = {
+            "created": [spec.field for spec in missing],
+            "indexed": indexed,
+            "timings_ms": {spec.field: {"antes": before.get(spec.field), "despues": after.get(spec.field)} for spec in specs},
+        }
+        logger.info(
+            "🗂️ Índices de payload | colección=%s | creados=%s | tiempo=%sms | filtros_ms=%s",
+            collection,
+            len(missing),
+            int((time.perf_counter() - started) * 1000),
+            report[collection]["timings_ms"],
+        )
+    return report
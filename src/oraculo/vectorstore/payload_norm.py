@@ -0,0 +1,197 @@
+"""
+Campos canónicos `*_norm` en el payload de las colecciones CER y SAG.
+
+Los valores de metadata llegan con distintas grafías (tildes, mayúsculas,
+espacios o guiones). La migración escribe, por cada campo filtrable, un campo
+`<campo>_norm` en forma canónica (ASCII, mayúsculas, palabras unidas con `_`)
+con índice keyword, para filtrar con un único `MatchAny` por campo en lugar de
+expandir cada valor en variantes. Las colecciones sin migrar se detectan por
+el esquema de payload y siguen usando la expansión de variantes.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+from qdrant_client import models as qm
+
+from ..config import Settings
+from .qdrant_client import get_qdrant_call_timeout, get_qdrant_client
+from .replica import served_payload_schema
+from .search import scroll_points_by_filter
+
+NORM_SUFFIX = "_norm"
+CER_NORM_FIELDS = ("especie", "producto", "variedad", "cliente", "pdf_filename")
+SAG_NORM_FIELDS = ("nombre_comercial", "cultivo", "objetivo")
+# Reintento de detección para colecciones aún sin migrar.
+NORM_CHECK_RETRY_SECONDS = 300.0
+logger = logging.getLogger(__name__)
+
+_norm_guard = threading.Lock()
+_norm_checks: dict[tuple[str, tuple[str, ...]], tuple[bool, float]] = {}
+
+
+def norm_field(field: str) -> str:
+    return f"{field}{NORM_SUFFIX}"
+
+
+def canonical_payload_value(value: Any) -> str:
+    """Forma canónica: sin tildes, mayúsculas y palabras unidas con `_` (`Uva de mesa` -> `UVA_DE_MESA`)."""
+    compact = " ".join(str(value or "").split())
+    if not compact:
+        return ""
+    ascii_compact = unicodedata.normalize("NFD", compact)
+    ascii_compact = "".join(ch for ch in ascii_compact if unicodedata.category(ch) != "Mn")
+    underscored = ascii_compact.upper().replace(" ", "_").replace("/", "_").replace("-", "_")
+    return "_".join(part for part in underscored.split("_") if part)
+
+
+def canonical_payload(payload: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """Campos `*_norm` para `payload` (listas se normalizan elemento a elemento)."""
+    out: Dict[str, Any] = {}
+    for field in fields:
+        value = payload.get(field)
+        if isinstance(value, list):
+            items = sorted({canonical_payload_value(item) for item in value} - {""})
+            if items:
+                out[norm_field(field)] = items
+            continue
+        canonical = canonical_payload_value(value)
+        if canonical:
+            out[norm_field(field)] = canonical
+    return out
+
+
+def collection_is_normalized(settings: Settings, collection: str, fields: Sequence[str]) -> bool:
+    """
+    True si la colección tiene índice keyword en todos los `*_norm` de
+    `fields` (la migración los crea al terminar de escribir payloads).
+    Con la réplica local sirviendo lecturas se usa el esquema registrado en
+    su última copia, para no filtrar por campos que la réplica aún no tiene.
+    """
+    served = served_payload_schema(settings, collection)
+    if served is not None:
+        return all(norm_field(field) in served for field in fields)
+    key = (collection, tuple(fields))
+    now = time.time()
+    with _norm_guard:
+        cached = _norm_checks.get(key)
+    if cached is not None and (cached[0] or now - cached[1] < NORM_CHECK_RETRY_SECONDS):
+        return cached[0]
+    try:
+        schema = get_qdrant_client(settings, allow_replica=False).get_collection(collection).payload_schema or {}
+        normalized = all(norm_field(field) in schema for field in fields)
+    except Exception:
+        logger.warning("No se pudo leer el esquema de payload de %s; se usan variantes.", collection, exc_info=True)
+        normalized = False
+    with _norm_guard:
+        _norm_checks[key] = (normalized, now)
+    if normalized and (cached is None or not cached[0]):
+        logger.info("🔑 Colección %s con campos canónicos | campos=%s", collection, list(fields))
+    return normalized
+
+
+def migrate_payload_norm(
+    settings: Settings,
+    collection: str,
+    fields: Sequence[str],
+    *,
+    full: bool = False,
+    batch_size: int = 256,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Escribe los `*_norm` de `fields` en todos los puntos de `collection` y
+    crea sus índices keyword. Incremental: omite puntos cuyos `*_norm` ya
+    coinciden (salvo `full`). Los puntos con el mismo payload canónico se
+    actualizan en una sola operación.
+    """
+    started = time.perf_counter()
+    qdrant = get_qdrant_client(settings, allow_replica=False)
+    norm_fields = [norm_field(field) for field in fields]
+    points = scroll_points_by_filter(
+        client=qdrant,
+        collection=collection,
+        query_filter=None,
+        limit_per_page=1024,
+        max_points=10_000_000,
+        payload_fields=[*fields, *norm_fields],
+        timeout=get_qdrant_call_timeout(settings),
+    )
+
+    groups: Dict[str, tuple[Dict[str, Any], List[Any]]] = {}
+    unchanged = 0
+    for point in points:
+        payload = point.get("payload") or {}
+        target = canonical_payload(payload, fields)
+        if not target:
+            unchanged += 1
+            continue
+        if not full and all(payload.get(key) == value for key, value in target.items()):
+            unchanged += 1
+            continue
+        group_key = json.dumps(target, sort_keys=True, ensure_ascii=False)
+        groups.setdefault(group_key, (target, []))[1].append(point["id"])
+
+    operations: List[qm.SetPayloadOperation] = []
+    for target, ids in groups.values():
+        for start in range(0, len(ids), max(batch_size, 1)):
+            operations.append(
+                qm.SetPayloadOperation(set_payload=qm.SetPayload(payload=target, points=ids[start:start + batch_size]))
+            )
+    updated = sum(len(ids) for _, ids in groups.values())
+
+    created_indexes = 0
+    if not dry_run:
+        for start in range(0, len(operations), 64):
+            qdrant.batch_update_points(
+                collection_name=collection,
+                update_operations=operations[start:start + 64],
+                wait=True,
+            )
+        schema = qdrant.get_collection(collection).payload_schema or {}
+        for field in norm_fields:
+            if field in schema:
+                continue
+            qdrant.create_payload_index(
+                collection_name=collection,
+                field_name=field,
+                field_schema=qm.PayloadSchemaType.KEYWORD,
+                wait=True,
+            )
+            created_indexes += 1
+        with _norm_guard:
+            for key in [key for key in _norm_checks if key[0] == collection]:
+                _norm_checks.pop(key, None)
+
+    stats = {
+        "points": len(points),
+        "updated": updated,
+        "unchanged": unchanged,
+        "operations": len(operations),
+        "created_indexes": created_indexes,
+    }
+    logger.info(
+        "🔑 Migración *_norm | colección=%s | simulada=%s | tiempo=%sms | %s",
+        collection,
+        "si" if dry_run else "no",
+        int((time.perf_counter() - started) * 1000),
+        stats,
+    )
+    return stats
+
+
+def canonical_values(values: Sequence[str]) -> List[str]:
+    return sorted({canonical_payload_value(value) for value in values} - {""})
+
+
+def match_any_condition(field: str, values: Sequence[str]) -> Optional[qm.FieldCondition]:
+    """`FieldCondition` MatchAny sobre `<field>_norm` con los valores canonizados."""
+    canonical = canonical_values(values)
+    if not canonical:
+        return None
+    return qm.FieldCondition(key=norm_field(field), match=qm.MatchAny(any=canonical))
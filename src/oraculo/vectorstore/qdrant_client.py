@@ -1,15 +1,169 @@
+"""Registro de clientes Qdrant compartidos por proceso, con pool de conexiones keep-alive."""
 from __future__ import annotations
 
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
 from qdrant_client import QdrantClient
 
 from ..config import Settings
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _PooledClient:
+    client: QdrantClient
+    created_at: float
+    checkouts: int = 0
+
+
+_registry_guard = threading.Lock()
+_registry: dict[tuple[Any, ...], _PooledClient] = {}
+_clients_created = 0
+_clients_closed = 0
+
 
-def get_qdrant_client(settings: Settings) -> QdrantClient:
+def _settings_fingerprint(settings: Settings) -> tuple[Any, ...]:
+    """
+    Identifica un cliente reutilizable: misma URL, credencial y parámetros de pool.
+    La API key se incluye solo como hash para no dejarla en memoria de métricas/logs.
+    """
+    api_key = settings.qdrant_api_key.get_secret_value()
+    return (
+        str(settings.qdrant_url),
+        hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16],
+        max(int(settings.qdrant_timeout_seconds), 1),
+        max(int(settings.qdrant_max_connections), 1),
+        max(int(settings.qdrant_max_keepalive_connections), 0),
+        max(float(settings.qdrant_keepalive_expiry_seconds), 0.0),
+    )
+
+
+def _build_client(settings: Settings) -> QdrantClient:
+    max_connections = max(int(settings.qdrant_max_connections), 1)
     return QdrantClient(
         url=str(settings.qdrant_url),
         api_key=settings.qdrant_api_key.get_secret_value(),
         # Preferimos estabilidad (REST). Más adelante se puede habilitar gRPC.
         prefer_grpc=False,
-        timeout=30,
+        timeout=max(int(settings.qdrant_timeout_seconds), 1),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(
+                max(int(settings.qdrant_max_keepalive_connections), 0),
+                max_connections,
+            ),
+            keepalive_expiry=max(float(settings.qdrant_keepalive_expiry_seconds), 0.0),
+        ),
     )
+
+
+def get_qdrant_client(settings: Settings, *, allow_replica: bool = True) -> QdrantClient:
+    """
+    Devuelve el cliente Qdrant compartido del proceso para estos settings.
+
+    El cliente REST (httpx) es thread-safe y mantiene un pool de conexiones
+    keep-alive, por lo que todas las llamadas de retrieval reutilizan las
+    mismas conexiones TLS en vez de abrir un cliente nuevo por llamada.
+
+    Con `QDRANT_REPLICA_PATH`, las lecturas se sirven desde la réplica local
+    mientras esté sana; `allow_replica=False` fuerza la nube (escrituras,
+    esquema de payload, herramientas de mantenimiento).
+    """
+    global _clients_created
+    if allow_replica and (settings.qdrant_replica_path or "").strip():
+        # Import diferido: la réplica usa este módulo para el cliente de la nube.
+        from .replica import replica_client
+
+        local = replica_client(settings)
+        if local is not None:
+            return local  # type: ignore[return-value]
+    key = _settings_fingerprint(settings)
+    with _registry_guard:
+        pooled = _registry.get(key)
+        if pooled is None:
+            pooled = _PooledClient(client=_build_client(settings), created_at=time.time())
+            _registry[key] = pooled
+            _clients_created += 1
+            logger.info(
+                "🔌 Qdrant | cliente compartido creado | url=%s | max_conexiones=%s | keepalive=%s | timeout=%ss",
+                key[0],
+                key[3],
+                key[4],
+                key[2],
+            )
+        pooled.checkouts += 1
+        return pooled.client
+
+
+def get_qdrant_call_timeout(settings: Settings) -> int:
+    """Timeout por llamada (segundos) para query/scroll contra Qdrant."""
+    return max(int(settings.qdrant_query_timeout_seconds), 1)
+
+
+def _open_connections(client: QdrantClient) -> int | None:
+    """
+    Cuenta conexiones HTTP abiertas en el pool httpx del cliente.
+    Best-effort: depende de atributos internos de qdrant-client/httpx.
+    """
+    try:
+        http_client = client._client.openapi_client.client._client  # type: ignore[attr-defined]
+        pool = http_client._transport._pool
+        return len(pool.connections)
+    except Exception:
+        return None
+
+
+def qdrant_pool_stats() -> dict[str, Any]:
+    """Métricas de uso del registro de clientes Qdrant."""
+    with _registry_guard:
+        clients = [
+            {
+                "url": key[0],
+                "checkouts": pooled.checkouts,
+                "open_connections": _open_connections(pooled.client),
+                "max_connections": key[3],
+            }
+            for key, pooled in _registry.items()
+        ]
+        return {
+            "clients_active": len(_registry),
+            "clients_created": _clients_created,
+            "clients_closed": _clients_closed,
+            "checkouts": sum(c["checkouts"] for c in clients),
+            "clients": clients,
+        }
+
+
+def close_qdrant_clients() -> None:
+    """Cierra todos los clientes del registro (apagado del bot)."""
+    global _clients_closed
+    from .replica import close_replica
+
+    close_replica()
+    stats = qdrant_pool_stats()
+    with _registry_guard:
+        pooled_clients = list(_registry.values())
+        _registry.clear()
+    closed = 0
+    for pooled in pooled_clients:
+        try:
+            pooled.client.close()
+            closed += 1
+        except Exception:
+            logger.warning("No se pudo cerrar cliente Qdrant.", exc_info=True)
+    with _registry_guard:
+        _clients_closed += closed
+    if pooled_clients:
+        logger.info(
+            "🔌 Qdrant | clientes cerrados=%s | checkouts_totales=%s | creados=%s",
+            len(pooled_clients),
+            stats["checkouts"],
+            stats["clients_created"],
+        )
@@ -0,0 +1,330 @@
+"""
+Réplica local (Qdrant embebido en disco) de las colecciones CER y SAG.
+
+El corpus es chico, así que `sync_replica` copia vectores y payloads de ambas
+colecciones a un `QdrantClient(path=QDRANT_REPLICA_PATH)` y guarda, por
+colección, el `points_count` y una huella de la configuración de vectores y
+del esquema de payload de la nube. Cada sincronización escribe colecciones
+nuevas (`<colección>__<generación>`) y al final mueve los alias con el nombre
+original, así las lecturas en curso nunca ven una colección a medio copiar.
+`get_qdrant_client` sirve las lecturas desde la réplica mientras esté sana:
+un chequeo periódico en background compara esas huellas con la nube y, ante
+drift o antigüedad mayor a `QDRANT_REPLICA_MAX_AGE_SECONDS`, vuelve a la nube
+y re-sincroniza. Sin nube configurada sirve también como entorno local de
+desarrollo/pruebas.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client import models as qm
+
+from ..config import Settings
+
+REPLICA_META_FILE = "replica_meta.json"
+REPLICA_PAGE_SIZE = 256
+logger = logging.getLogger(__name__)
+
+
+class _SerializedClient:
+    """
+    Envoltorio del cliente embebido: el modo local de qdrant-client no es
+    thread-safe, así que cada llamada toma un lock (las lecturas locales
+    toman milisegundos).
+    """
+
+    def __init__(self, client: QdrantClient) -> None:
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def _call(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return _call
+
+
+@dataclass(slots=True)
+class _ReplicaState:
+    client: Optional[_SerializedClient] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+    healthy: bool = False
+    checked_at: float = 0.0
+    busy: bool = False
+
+
+_replica_guard = threading.Lock()
+_state = _ReplicaState()
+
+
+def _replica_collections(settings: Settings) -> list[str]:
+    return [settings.qdrant_collection, settings.qdrant_sag_collection]
+
+
+def _meta_path(settings: Settings) -> Path:
+    return Path(settings.qdrant_replica_path) / REPLICA_META_FILE
+
+
+def _payload_schema(info: Any) -> Dict[str, Any]:
+    """Campos indexados -> (tipo, puntos indexados); cambia con `set_payload` sobre campos indexados."""
+    return {
+        name: [str(getattr(index.data_type, "value", index.data_type)), int(index.points or 0)]
+        for name, index in sorted((info.payload_schema or {}).items())
+    }
+
+
+def _collection_fingerprint(info: Any) -> str:
+    """Huella de la configuración de vectores (dimensión, distancia, nombres) y del esquema de payload."""
+    params = info.config.params
+
+    def _dump(value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return {name: _dump(item) for name, item in sorted(value.items())}
+        return value.model_dump(mode="json", exclude_none=True)
+
+    data = {
+        "vectors": _dump(params.vectors),
+        "sparse_vectors": _dump(params.sparse_vectors),
+        "payload_schema": _payload_schema(info),
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _local_client(settings: Settings) -> _SerializedClient:
+    with _replica_guard:
+        if _state.client is None:
+            path = Path(settings.qdrant_replica_path)
+            path.mkdir(parents=True, exist_ok=True)
+            _state.client = _SerializedClient(QdrantClient(path=str(path)))
+            try:
+                _state.meta = json.loads(_meta_path(settings).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                _state.meta = {}
+            _state.healthy = bool(_state.meta)
+            logger.info(
+                "🔌 Qdrant réplica local abierta | ruta=%s | colecciones=%s",
+                path,
+                sorted((_state.meta.get("collections") or {}).keys()),
+            )
+        return _state.client
+
+
+def _cloud_client(settings: Settings) -> QdrantClient:
+    from .qdrant_client import get_qdrant_client
+
+    return get_qdrant_client(settings, allow_replica=False)
+
+
+def replica_client(settings: Settings) -> Optional[_SerializedClient]:
+    """
+    Cliente de la réplica si está sana y al día; None para usar la nube.
+    Programa el chequeo de drift en background cuando vence el intervalo.
+    """
+    if not (settings.qdrant_replica_path or "").strip():
+        return None
+    client = _local_client(settings)
+    now = time.time()
+    interval = max(float(settings.qdrant_replica_check_interval_seconds), 0.0)
+    if now - _state.checked_at >= interval:
+        _run_in_background(settings, check_replica_drift, "qdrant-replica-check")
+    if not _state.healthy:
+        return None
+    synced_at = float(_state.meta.get("synced_at") or 0.0)
+    if now - synced_at > max(float(settings.qdrant_replica_max_age_seconds), 0.0):
+        return None
+    return client
+
+
+def served_payload_schema(settings: Settings, collection: str) -> Optional[set[str]]:
+    """
+    Campos con índice de payload en la nube al momento de la copia si la
+    réplica está sirviendo lecturas; None si las lecturas van a la nube.
+    """
+    if replica_client(settings) is None:
+        return None
+    entry = (_state.meta.get("collections") or {}).get(collection) or {}
+    return set(entry.get("payload_schema") or ())
+
+
+def _run_in_background(settings: Settings, target: Callable[[Settings], Any], name: str) -> None:
+    with _replica_guard:
+        if _state.busy:
+            return
+        _state.busy = True
+        _state.checked_at = time.time()
+
+    def _runner() -> None:
+        try:
+            target(settings)
+        except Exception:
+            logger.warning("Falló tarea de réplica Qdrant (%s).", name, exc_info=True)
+        finally:
+            with _replica_guard:
+                _state.busy = False
+
+    threading.Thread(target=_runner, name=name, daemon=True).start()
+
+
+def check_replica_drift(settings: Settings) -> Dict[str, Any]:
+    """
+    Compara `points_count` y configuración de vectores de la nube con los
+    registrados en la réplica (y el conteo local). Ante drift o antigüedad,
+    se desactiva la réplica y se re-sincroniza.
+    """
+    cloud = _cloud_client(settings)
+    local = _local_client(settings)
+    recorded = _state.meta.get("collections") or {}
+    drift: Dict[str, Any] = {}
+    for collection in _replica_collections(settings):
+        entry = recorded.get(collection)
+        info = cloud.get_collection(collection)
+        if entry is None:
+            drift[collection] = "sin_replicar"
+            continue
+        replicated = int(entry.get("points_count", -1))
+        if int(info.points_count or 0) != replicated:
+            drift[collection] = f"points_count {replicated} -> {info.points_count}"
+        elif _collection_fingerprint(info) != entry.get("config"):
+            drift[collection] = "configuracion_o_esquema"
+        elif not local.collection_exists(collection) or int(local.count(collection, exact=True).count) != replicated:
+            drift[collection] = "conteo_local"
+    age = time.time() - float(_state.meta.get("synced_at") or 0.0)
+    stale = age > max(float(settings.qdrant_replica_max_age_seconds), 0.0)
+    if drift or stale:
+        with _replica_guard:
+            _state.healthy = False
+        logger.warning(
+            "Réplica Qdrant desactualizada (drift=%s | antigüedad=%ss); lecturas a la nube y re-sincronización.",
+            drift,
+            int(age),
+        )
+        sync_replica(settings)
+    return drift
+
+
+def _physical_name(collection: str, generation: int) -> str:
+    return f"{collection}__{generation}"
+
+
+def sync_replica(settings: Settings) -> Dict[str, Any]:
+    """
+    Copia vectores y payloads de CER y SAG desde la nube a colecciones nuevas
+    de la réplica local y, al terminar, mueve los alias en una sola operación.
+    Las lecturas que ya tomaron el cliente siguen viendo la copia anterior.
+    """
+    started = time.perf_counter()
+    cloud = _cloud_client(settings)
+    local = _local_client(settings)
+    generation = int(_state.meta.get("generation") or 0) + 1
+    collections: Dict[str, Any] = {}
+    for collection in _replica_collections(settings):
+        info = cloud.get_collection(collection)
+        physical = _physical_name(collection, generation)
+        if local.collection_exists(physical):
+            local.delete_collection(physical)
+        local.create_collection(
+            collection_name=physical,
+            vectors_config=info.config.params.vectors,
+            sparse_vectors_config=info.config.params.sparse_vectors,
+        )
+        copied = 0
+        offset = None
+        while True:
+            points, offset = cloud.scroll(
+                collection_name=collection,
+                limit=REPLICA_PAGE_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+                timeout=max(int(settings.qdrant_query_timeout_seconds), 1),
+            )
+            if points:
+                local.upsert(
+                    collection_name=physical,
+                    points=[qm.PointStruct(id=p.id, vector=p.vector or {}, payload=p.payload or {}) for p in points],
+                )
+                copied += len(points)
+            if offset is None or not points:
+                break
+        collections[collection] = {
+            "physical": physical,
+            "points_count": copied,
+            "cloud_points_count": int(info.points_count or 0),
+            "config": _collection_fingerprint(info),
+            "payload_schema": sorted(_payload_schema(info)),
+        }
+        logger.info("📦 Réplica Qdrant | colección=%s | puntos=%s", collection, copied)
+
+    _swap_aliases(local, collections)
+    meta = {"synced_at": time.time(), "generation": generation, "collections": collections}
+    path = _meta_path(settings)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+    # Si la nube cambió durante la copia, el próximo chequeo lo detecta.
+    consistent = all(entry["points_count"] == entry["cloud_points_count"] for entry in collections.values())
+    with _replica_guard:
+        _state.meta = meta
+        _state.healthy = consistent
+        _state.checked_at = time.time()
+    _drop_old_generations(local, collections)
+    logger.info(
+        "📦 Réplica Qdrant sincronizada | ruta=%s | generación=%s | consistente=%s | tiempo=%sms",
+        settings.qdrant_replica_path,
+        generation,
+        consistent,
+        int((time.perf_counter() - started) * 1000),
+    )
+    return meta
+
+
+def _swap_aliases(local: _SerializedClient, collections: Dict[str, Any]) -> None:
+    current = {alias.alias_name for alias in local.get_aliases().aliases}
+    operations: list[Any] = []
+    for collection, entry in collections.items():
+        if collection in current:
+            operations.append(qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=collection)))
+        elif local.collection_exists(collection):
+            # Réplica con el formato anterior (colección sin alias): se reemplaza una vez.
+            local.delete_collection(collection)
+        operations.append(
+            qm.CreateAliasOperation(
+                create_alias=qm.CreateAlias(collection_name=entry["physical"], alias_name=collection)
+            )
+        )
+    local.update_collection_aliases(change_aliases_operations=operations)
+
+
+def _drop_old_generations(local: _SerializedClient, collections: Dict[str, Any]) -> None:
+    active = {entry["physical"] for entry in collections.values()}
+    prefixes = tuple(f"{collection}__" for collection in collections)
+    for description in local.get_collections().collections:
+        name = description.name
+        if name.startswith(prefixes) and name not in active:
+            local.delete_collection(name)
+
+
+def close_replica() -> None:
+    with _replica_guard:
+        client, _state.client = _state.client, None
+        _state.healthy = False
+    if client is not None:
+        try:
+            client.close()
+        except Exception:
+            logger.warning("No se pudo cerrar la réplica Qdrant.", exc_info=True)
@@ -1,20 +1,25 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client import models as qm
 from qdrant_client.http.exceptions import UnexpectedResponse
 
+logger = logging.getLogger(__name__)
+
 
 def query_top_chunks(
     client: QdrantClient,
     collection: str,
-    query_vector: List[float],
+    query_vector: Union[List[float], np.ndarray],
     top_k: int = 8,
     score_threshold: Optional[float] = None,
     query_filter: Optional[qm.Filter] = None,
     payload_fields: Optional[List[str]] = None,
+    timeout: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     with_payload: Any = True if payload_fields is None else payload_fields
 
@@ -26,6 +31,7 @@ def query_top_chunks(
         score_threshold=score_threshold,
         with_payload=with_payload,
         with_vectors=False,
+        timeout=timeout,
     )
 
     results: List[Dict[str, Any]] = []
@@ -40,6 +46,49 @@ def query_top_chunks(
     return results
 
 
+def query_top_groups(
+    client: QdrantClient,
+    collection: str,
+    query_vector: Union[List[float], np.ndarray],
+    group_by: str,
+    limit: int = 8,
+    group_size: int = 1,
+    query_filter: Optional[qm.Filter] = None,
+    payload_fields: Optional[List[str]] = None,
+    timeout: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Búsqueda agrupada en el servidor: top `limit` grupos por `group_by`,
+    con hasta `group_size` hits por grupo (orden de score descendente).
+    Requiere índice keyword para el campo de agrupación.
+    """
+    with_payload: Any = True if payload_fields is None else payload_fields
+
+    resp = client.query_points_groups(
+        collection_name=collection,
+        group_by=group_by,
+        query=query_vector,
+        limit=limit,
+        group_size=group_size,
+        query_filter=query_filter,
+        with_payload=with_payload,
+        with_vectors=False,
+        timeout=timeout,
+    )
+
+    results: List[Dict[str, Any]] = []
+    for group in resp.groups:
+        for p in group.hits:
+            results.append(
+                {
+                    "id": p.id,
+                    "score": p.score,
+                    "payload": p.payload or {},
+                }
+            )
+    return results
+
+
 def scroll_doc_points(
     client: QdrantClient,
     collection: str,
@@ -47,6 +96,7 @@ def scroll_doc_points(
     limit_per_page: int = 128,
     max_points: int = 2000,
     payload_fields: Optional[List[str]] = None,
+    timeout: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     Trae puntos de un documento (doc_id) usando scroll.
@@ -70,6 +120,7 @@ def scroll_doc_points(
                 offset=next_offset,
                 with_payload=with_payload,
                 with_vectors=False,
+                timeout=timeout,
             )
         except UnexpectedResponse:
             raise
@@ -85,13 +136,79 @@ def scroll_doc_points(
     return all_points
 
 
+def scroll_points_for_docs(
+    client: QdrantClient,
+    collection: str,
+    doc_ids: Sequence[str],
+    limit_per_page: int = 256,
+    max_points_per_doc: int = 2000,
+    payload_fields: Optional[List[str]] = None,
+    extra_filter: Optional[qm.Filter] = None,
+    is_doc_complete: Optional[Callable[[str, List[Dict[str, Any]]], bool]] = None,
+    timeout: Optional[int] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Trae puntos de varios documentos en un solo scroll (`doc_id` MatchAny)
+    y los separa por `doc_id` en cliente.
+
+    Deja de paginar cuando todos los documentos están completos: alcanzaron
+    `max_points_per_doc` o `is_doc_complete(doc_id, puntos)` devolvió True.
+    Requiere índice keyword para 'doc_id' en Qdrant Cloud.
+    """
+    with_payload: Any = True if payload_fields is None else payload_fields
+    wanted = [d for d in dict.fromkeys(str(d) for d in doc_ids) if d]
+    by_doc: Dict[str, List[Dict[str, Any]]] = {doc_id: [] for doc_id in wanted}
+    if not wanted:
+        return by_doc
+
+    must: List[Any] = [qm.FieldCondition(key="doc_id", match=qm.MatchAny(any=wanted))]
+    if extra_filter is not None:
+        must.append(extra_filter)
+    pending = set(wanted)
+    next_offset = None
+
+    while pending:
+        points, next_offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=qm.Filter(must=must),
+            limit=limit_per_page,
+            offset=next_offset,
+            with_payload=with_payload,
+            with_vectors=False,
+            timeout=timeout,
+        )
+
+        touched: set[str] = set()
+        for p in points:
+            payload = p.payload or {}
+            doc_id = str(payload.get("doc_id", ""))
+            if doc_id not in pending:
+                continue
+            bucket = by_doc[doc_id]
+            bucket.append({"id": p.id, "payload": payload})
+            if len(bucket) >= max_points_per_doc:
+                pending.discard(doc_id)
+            touched.add(doc_id)
+
+        for doc_id in touched & pending:
+            bucket = by_doc[doc_id]
+            if is_doc_complete is not None and is_doc_complete(doc_id, bucket):
+                pending.discard(doc_id)
+
+        if next_offset is None or len(points) == 0:
+            break
+
+    return by_doc
+
+
 def scroll_points_by_filter(
     client: QdrantClient,
     collection: str,
-    query_filter: qm.Filter,
+    query_filter: Optional[qm.Filter],
     limit_per_page: int = 128,
     max_points: int = 5000,
     payload_fields: Optional[List[str]] = None,
+    timeout: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     Scroll genérico para recuperar puntos por filtro en una colección.
@@ -108,6 +225,7 @@ def scroll_points_by_filter(
             offset=next_offset,
             with_payload=with_payload,
             with_vectors=False,
+            timeout=timeout,
         )
 
         for p in points:
@@ -119,3 +237,41 @@ def scroll_points_by_filter(
             break
 
     return all_points[:max_points]
+
+
+def count_points_by_payload_value(
+    client: QdrantClient,
+    collection: str,
+    key: str,
+    timeout: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Cantidad de puntos por valor de `key` (p.ej. chunks por doc_id).
+    Usa facet exacto; si no está disponible, cuenta con un scroll liviano.
+    """
+    try:
+        resp = client.facet(
+            collection_name=collection,
+            key=key,
+            limit=1_000_000,
+            exact=True,
+            timeout=timeout,
+        )
+        return {str(hit.value): int(hit.count) for hit in resp.hits}
+    except Exception:
+        logger.warning("Facet por %s no disponible en %s; se cuenta por scroll.", key, collection, exc_info=True)
+
+    counts: Dict[str, int] = {}
+    for point in scroll_points_by_filter(
+        client=client,
+        collection=collection,
+        query_filter=None,
+        limit_per_page=1024,
+        max_points=10_000_000,
+        payload_fields=[key],
+        timeout=timeout,
+    ):
+        value = str((point.get("payload") or {}).get(key) or "").strip()
+        if value:
+            counts[value] = counts.get(value, 0) + 1
+    return counts
@@ -0,0 +1,167 @@
+"""Adaptación del embedding de consulta a la dimensión de cada colección Qdrant."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..config import Settings
+from .qdrant_client import get_qdrant_client
+
+DISCOVERY_RETRY_SECONDS = 300.0
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _CollectionDim:
+    dim: int
+    discovered: bool
+    checked_at: float
+
+
+_dims_guard = threading.Lock()
+_dims: dict[str, _CollectionDim] = {}
+_projections: dict[str, Optional[np.ndarray]] = {}
+
+
+def _configured_dims(settings: Settings) -> Dict[str, int]:
+    return {
+        settings.qdrant_collection: int(settings.qdrant_cer_chunks_vector_dim),
+        settings.qdrant_sag_collection: int(settings.qdrant_sag_vector_dim),
+    }
+
+
+def _read_collection_dim(settings: Settings, collection: str) -> Optional[int]:
+    """Lee la dimensión del vector (sin nombre o único) desde collection info."""
+    info = get_qdrant_client(settings).get_collection(collection)
+    vectors: Any = info.config.params.vectors
+    if isinstance(vectors, dict):
+        if len(vectors) != 1:
+            return None
+        vectors = next(iter(vectors.values()))
+    size = getattr(vectors, "size", None)
+    return int(size) if size else None
+
+
+def get_collection_vector_dim(settings: Settings, collection: str) -> int:
+    """
+    Dimensión de la colección, descubierta desde Qdrant y cacheada por proceso.
+
+    Si la consulta falla se usa la dimensión configurada en settings y se
+    reintenta el descubrimiento pasado `DISCOVERY_RETRY_SECONDS`.
+    """
+    now = time.time()
+    with _dims_guard:
+        cached = _dims.get(collection)
+    if cached is not None and (cached.discovered or now - cached.checked_at < DISCOVERY_RETRY_SECONDS):
+        return cached.dim
+
+    fallback = _configured_dims(settings).get(collection, int(settings.qdrant_cer_chunks_vector_dim))
+    try:
+        discovered = _read_collection_dim(settings, collection)
+    except Exception:
+        logger.warning(
+            "No se pudo leer la dimensión de la colección %s; se usa la configurada (%s).",
+            collection,
+            fallback,
+            exc_info=True,
+        )
+        discovered = None
+
+    entry = _CollectionDim(
+        dim=discovered or fallback,
+        discovered=discovered is not None,
+        checked_at=now,
+    )
+    if entry.discovered and entry.dim != fallback:
+        logger.warning(
+            "Dimensión configurada para %s (%s) difiere de Qdrant (%s); se usa la de Qdrant.",
+            collection,
+            fallback,
+            entry.dim,
+        )
+    with _dims_guard:
+        _dims[collection] = entry
+    return entry.dim
+
+
+def warm_collection_dims(settings: Settings) -> Dict[str, int]:
+    """Descubre y cachea las dimensiones de las colecciones CER y SAG (arranque del bot)."""
+    dims = {
+        collection: get_collection_vector_dim(settings, collection)
+        for collection in _configured_dims(settings)
+    }
+    logger.info("📐 Qdrant | dimensiones de colecciones | %s", dims)
+    return dims
+
+
+def _load_projection(settings: Settings, collection: str) -> Optional[np.ndarray]:
+    """
+    Proyección lineal opcional `<dir>/<colección>.npy` con forma (dim_origen, dim_destino).
+    """
+    with _dims_guard:
+        if collection in _projections:
+            return _projections[collection]
+
+    matrix: Optional[np.ndarray] = None
+    base_dir = (settings.qdrant_vector_projection_dir or "").strip()
+    if base_dir:
+        path = Path(base_dir) / f"{collection}.npy"
+        if path.exists():
+            try:
+                matrix = np.load(path, allow_pickle=False).astype(np.float32, copy=False)
+                if matrix.ndim != 2:
+                    raise ValueError(f"forma inválida {matrix.shape}")
+                logger.info(
+                    "📐 Proyección lineal cargada | colección=%s | forma=%s",
+                    collection,
+                    matrix.shape,
+                )
+            except Exception:
+                logger.warning("No se pudo cargar proyección %s; se usa padding/truncado.", path, exc_info=True)
+                matrix = None
+
+    with _dims_guard:
+        _projections[collection] = matrix
+    return matrix
+
+
+def adapt_query_vector(
+    settings: Settings,
+    query_vector: np.ndarray,
+    collection: str,
+) -> np.ndarray:
+    """
+    Proyecta el embedding de consulta a la dimensión de `collection`.
+
+    - Proyección lineal almacenada si existe y su forma calza.
+    - Si no, padding con ceros o truncado (sin copiar cuando ya calza).
+    """
+    target_dim = get_collection_vector_dim(settings, collection)
+    current_dim = int(query_vector.shape[0])
+
+    projection = _load_projection(settings, collection)
+    if projection is not None and projection.shape == (current_dim, target_dim):
+        projected = query_vector @ projection
+        norm = float(np.linalg.norm(projected))
+        return projected / norm if norm else projected
+
+    if current_dim == target_dim:
+        return query_vector
+    if current_dim < target_dim:
+        return np.pad(query_vector, (0, target_dim - current_dim))
+    return query_vector[:target_dim]
+
+
+def collection_dims_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Estado actual de las dimensiones cacheadas (para logs/diagnóstico)."""
+    with _dims_guard:
+        return {
+            collection: {"dim": entry.dim, "discovered": entry.discovered}
+            for collection, entry in _dims.items()
+        }